@@ -1,57 +1,64 @@
-from fastapi import APIRouter, HTTPException
-from typing import Dict, Any
+import asyncio
+import json
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Dict, Any, List
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from demo.competitor_selection import find_competitor
+from demo.competitor_selection import find_competitor, find_competitors_batch
 
 router = APIRouter(prefix="/api/demo", tags=["demo"])
 
 
+def _parse_reference_product(product: Dict[str, Any]) -> Dict[str, Any]:
+    required_fields = ["title", "price", "rating", "reviews", "category"]
+    for field in required_fields:
+        if field not in product:
+            raise HTTPException(status_code=400, detail=f"Missing required field: {field}")
+    
+    return {
+        "asin": product.get("asin", "DEMO-" + product.get("title", "unknown")[:10]),
+        "title": product["title"],
+        "price": float(product["price"]),
+        "rating": float(product["rating"]),
+        "reviews": int(product["reviews"]),
+        "category": product["category"]
+    }
+
+
+def _competitor_result(reference_product: Dict[str, Any], competitor: Dict[str, Any]) -> Dict[str, Any]:
+    if competitor:
+        return {
+            "success": True,
+            "reference_product": reference_product,
+            "selected_competitor": {
+                "title": competitor["title"],
+                "asin": competitor["asin"],
+                "price": competitor["metrics"]["price"],
+                "rating": competitor["metrics"]["rating"],
+                "reviews": competitor["metrics"]["reviews"],
+                "score": competitor["total_score"]
+            }
+        }
+    return {
+        "success": False,
+        "reference_product": reference_product,
+        "message": "No qualified competitor found"
+    }
+
+
 @router.post("/run-competitor-selection")
 async def run_competitor_selection(product: Dict[str, Any]) -> Dict[str, Any]:
     try:
         from backend import main
         xray = main.xray
         
-        required_fields = ["title", "price", "rating", "reviews", "category"]
-        for field in required_fields:
-            if field not in product:
-                raise HTTPException(status_code=400, detail=f"Missing required field: {field}")
-        
-        reference_product = {
-            "asin": product.get("asin", "DEMO-" + product.get("title", "unknown")[:10]),
-            "title": product["title"],
-            "price": float(product["price"]),
-            "rating": float(product["rating"]),
-            "reviews": int(product["reviews"]),
-            "category": product["category"]
-        }
-        
-        competitor = find_competitor(reference_product, xray)
-        
-        if competitor and competitor is not None:
-            return {
-                "success": True,
-                "reference_product": reference_product,
-                "selected_competitor": {
-                    "title": competitor["title"],
-                    "asin": competitor["asin"],
-                    "price": competitor["metrics"]["price"],
-                    "rating": competitor["metrics"]["rating"],
-                    "reviews": competitor["metrics"]["reviews"],
-                    "score": competitor["total_score"]
-                }
-            }
-        else:
-            return {
-                "success": False,
-                "reference_product": reference_product,
-                "message": "No qualified competitor found"
-            }
-            
+        reference_product = _parse_reference_product(product)
+        competitor = await asyncio.to_thread(find_competitor, reference_product, xray)
+        return _competitor_result(reference_product, competitor)
     except HTTPException:
         raise
     except Exception as e:
@@ -64,3 +71,19 @@ async def run_competitor_selection(product: Dict[str, Any]) -> Dict[str, Any]:
             "message": f"No qualified competitor found: {str(e)}"
         }
 
+
+@router.post("/run-competitor-selection/batch")
+def run_competitor_selection_batch(products: List[Dict[str, Any]], batch_size: int = Query(100, ge=1)) -> StreamingResponse:
+    from backend import main
+    xray = main.xray
+    
+    try:
+        reference_products = [_parse_reference_product(product) for product in products]
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    def stream():
+        for reference_product, competitor in find_competitors_batch(reference_products, xray, batch_size=batch_size):
+            yield json.dumps(_competitor_result(reference_product, competitor)) + "\n"
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
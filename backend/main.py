@@ -1,15 +1,55 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+from contextlib import asynccontextmanager
+import gzip
+import hashlib
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+import json
+import os
 import sys
+import threading
 from pathlib import Path
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+from backend.response_cache import ResponseCache
 from xray_sdk import XRay
-from xray_sdk.storage import JSONFileStorage
+from xray_sdk.buffered_storage import BufferedStorage
+from xray_sdk.codecs import json_dumps, json_loads
+from xray_sdk.events import EventBroker
+from xray_sdk.metrics import MetricsAggregator, MetricsSnapshots
+from xray_sdk.retention import RetentionCompactor, RetentionPolicy
+from xray_sdk.search import IndexedStorage, SearchIndex
+from xray_sdk.storage import JSONFileStorage, encode_cursor, execution_from_dict, validate_execution_dict
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if compactor is not None:
+        compactor.start()
+    if search_index.count() == 0:
+        # Executions stored before search existed; index them without delaying startup.
+        threading.Thread(target=indexed_storage.reindex, name="xray-reindex", daemon=True).start()
+    metrics_thread = threading.Thread(target=_snapshot_metrics, name="xray-metrics-snapshot", daemon=True)
+    metrics_thread.start()
+    yield
+    if compactor is not None:
+        compactor.stop()
+    metrics_stop.set()
+    metrics_thread.join()
+    events.close()
+    xray.close()
+    _save_metrics()
+
 
-app = FastAPI(title="X-Ray Dashboard API", version="1.0.0")
+app = FastAPI(title="X-Ray Dashboard API", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -17,35 +57,314 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 project_root = Path(__file__).parent.parent
 storage_path = str(project_root / "xray_storage")
-xray = XRay(storage=JSONFileStorage(storage_path=storage_path))
+metrics_snapshots = MetricsSnapshots(str(project_root / "xray_storage" / "metrics"))
+
+
+def _init_metrics() -> MetricsAggregator:
+    """
+    Each worker process counts only its own executions, starting from zero;
+    /api/metrics adds up every worker's snapshot plus those of earlier runs.
+    """
+    legacy_path = project_root / "xray_storage" / "metrics.json"
+    try:
+        # Single-file snapshot from before per-process snapshots; the first worker adopts it.
+        if not (metrics_snapshots.directory / "base.json").exists():
+            os.replace(legacy_path, metrics_snapshots.directory / "base.json")
+    except FileNotFoundError:
+        pass
+    metrics_snapshots.collect()
+    return MetricsAggregator()
+
+
+def _save_metrics() -> None:
+    metrics_snapshots.save(xray.metrics_aggregator)
+
+
+def _snapshot_metrics() -> None:
+    while not metrics_stop.wait(METRICS_SNAPSHOT_INTERVAL):
+        try:
+            _save_metrics()
+        except OSError as e:
+            print(f"Failed to snapshot metrics: {e}", file=sys.stderr)
+
+
+# Bounds what a crash loses, and how stale other workers' metrics can be in /api/metrics.
+METRICS_SNAPSHOT_INTERVAL = float(os.environ.get("XRAY_METRICS_SNAPSHOT_SECONDS", 60))
+metrics_stop = threading.Event()
+
+events = EventBroker(max_queue_size=1000)
+search_index = SearchIndex(str(project_root / "xray_storage" / "search.db"))
+indexed_storage = IndexedStorage(JSONFileStorage(storage_path=storage_path), search_index)
+xray = XRay(storage=BufferedStorage(indexed_storage), metrics=_init_metrics(), events=events)
+
+# Serialized bodies of ended executions by (id, steps, fields). Ended executions only change
+# when retention removes them, so entries don't expire; the cache is cleared after compaction.
+execution_cache = ResponseCache(max_bytes=int(os.environ.get("XRAY_EXECUTION_CACHE_MB", 64)) * 1024 * 1024)
+
+
+def _retention_policy() -> Optional[RetentionPolicy]:
+    """
+    Retention is off unless configured: XRAY_RETENTION_MAX_AGE_DAYS deletes older
+    executions, XRAY_RETENTION_DOWNSAMPLE_AFTER_DAYS keeps only their summary and
+    XRAY_RETENTION_MAX_COUNT keeps only the newest executions.
+    """
+    max_age_days = os.environ.get("XRAY_RETENTION_MAX_AGE_DAYS")
+    downsample_after_days = os.environ.get("XRAY_RETENTION_DOWNSAMPLE_AFTER_DAYS")
+    max_count = os.environ.get("XRAY_RETENTION_MAX_COUNT")
+    if not (max_age_days or downsample_after_days or max_count):
+        return None
+    return RetentionPolicy(
+        max_age_seconds=float(max_age_days) * 86400 if max_age_days else None,
+        downsample_after_seconds=float(downsample_after_days) * 86400 if downsample_after_days else None,
+        max_count=int(max_count) if max_count else None,
+    )
+
+
+retention_policy = _retention_policy()
+compactor = (
+    RetentionCompactor(
+        xray.storage,
+        retention_policy,
+        interval=float(os.environ.get("XRAY_RETENTION_INTERVAL_SECONDS", 3600)),
+        on_compact=lambda result: execution_cache.clear() if result.get("deleted") or result.get("downsampled") else None,
+    )
+    if retention_policy is not None
+    else None
+)
+
+COMPRESS_MIN_BYTES = 1024
+
+
+def _accepted_encodings(request: Request) -> List[str]:
+    accepted = set()
+    for part in request.headers.get("accept-encoding", "").split(","):
+        coding, _, params = part.partition(";")
+        if params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(coding.strip().lower())
+    return [encoding for encoding in ("br", "gzip") if encoding in accepted and (encoding != "br" or brotli is not None)]
+
+
+def _execution_body(data: Dict[str, Any]) -> Dict[str, Any]:
+    body = json_dumps(data).encode()
+    return {"etag": hashlib.blake2b(body, digest_size=16).hexdigest(), "ended": data["ended_at"] is not None, "identity": body}
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match against any representation of the body (the encoding suffix is ignored)."""
+    for tag in request.headers.get("if-none-match", "").split(","):
+        tag = tag.strip().removeprefix("W/").strip('"')
+        if tag == "*" or tag.split("-")[0] == etag:
+            return True
+    return False
+
+
+def _set_next_cursor(response: Response, page: List[Dict[str, Any]], limit: int) -> None:
+    if page and len(page) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(page[-1])
 
 
 @app.get("/api/executions")
-def list_executions(limit: int = 100) -> List[Dict[str, Any]]:
+def list_executions(
+    response: Response,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    name: Optional[str] = None,
+    started_after: Optional[str] = None,
+    started_before: Optional[str] = None,
+    reference_product_id: Optional[str] = None,
+    step_status: Optional[str] = None,
+) -> List[Dict[str, Any]]:
     try:
-        executions = xray.list_executions(limit=limit)
-        return [execution.to_dict() for execution in executions]
+        executions = xray.list_executions(
+            limit=limit, cursor=cursor, name=name, started_after=started_after, started_before=started_before,
+            reference_product_id=reference_product_id, step_status=step_status
+        )
+        page = [execution.to_dict() for execution in executions]
+        _set_next_cursor(response, page, limit)
+        return page
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/executions/summary")
+def list_execution_summaries(
+    response: Response,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    name: Optional[str] = None,
+    started_after: Optional[str] = None,
+    started_before: Optional[str] = None,
+    reference_product_id: Optional[str] = None,
+    step_status: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    try:
+        page = xray.list_execution_summaries(
+            limit=limit, cursor=cursor, name=name, started_after=started_after, started_before=started_before,
+            reference_product_id=reference_product_id, step_status=step_status
+        )
+        _set_next_cursor(response, page, limit)
+        return page
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/executions/stream")
+async def stream_executions(execution_id: Optional[str] = None, keepalive_s: float = 15.0) -> StreamingResponse:
+    """
+    Server-Sent Events: execution_started, step and execution_ended events as they
+    happen, optionally for one execution only. A client that falls too far behind
+    gets a final "dropped" event and should reconnect and refetch.
+    """
+    subscription = events.subscribe(execution_id, loop=asyncio.get_running_loop())
+    
+    async def event_stream():
+        try:
+            while True:
+                try:
+                    event = await subscription.aget(timeout=keepalive_s)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    if subscription.dropped:
+                        yield "event: dropped\ndata: {}\n\n"
+                    return
+                yield f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+        finally:
+            subscription.close()
+    
+    return StreamingResponse(
+        event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.get("/api/executions/{execution_id}")
-def get_execution(execution_id: str) -> Dict[str, Any]:
+def get_execution(
+    execution_id: str, request: Request, steps: Optional[str] = None, fields: Optional[str] = None
+) -> Response:
+    """
+    `steps` (comma-separated step names, indexes or "start:end" ranges) and
+    `fields` (comma-separated dotted paths into each step, e.g.
+    metadata.failed_by_filter) limit the response to what the client shows;
+    only the selected steps are parsed.
+
+    Ended executions are served from a byte-bounded LRU of serialized (and,
+    per encoding, compressed) bodies with a strong ETag and an immutable
+    Cache-Control, so reloads are answered with 304s or cached bytes without
+    touching storage.
+    """
     try:
-        execution = xray.get_execution(execution_id)
-        if not execution:
-            raise HTTPException(status_code=404, detail="Execution not found")
-        return execution.to_dict()
+        cache_key = (execution_id, steps, fields)
+        body = execution_cache.get(cache_key)
+        if body is None:
+            view = xray.get_execution_view(execution_id)
+            if not view:
+                raise HTTPException(status_code=404, detail="Execution not found")
+            body = _execution_body(view.to_dict(
+                steps=steps.split(",") if steps else None,
+                fields=fields.split(",") if fields else None,
+            ))
+            if body["ended"]:
+                execution_cache.set(cache_key, body)
+        
+        encoding = None
+        if len(body["identity"]) >= COMPRESS_MIN_BYTES:
+            encoding = next(iter(_accepted_encodings(request)), None)
+        headers = {
+            "ETag": f'"{body["etag"]}-{encoding}"' if encoding else f'"{body["etag"]}"',
+            "Cache-Control": "public, max-age=31536000, immutable" if body["ended"] else "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+        if _etag_matches(request, body["etag"]):
+            return Response(status_code=304, headers=headers)
+        if encoding is None:
+            return Response(body["identity"], media_type="application/json", headers=headers)
+        
+        if encoding not in body:
+            if encoding == "br":
+                compressed = brotli.compress(body["identity"], quality=5)
+            else:
+                compressed = gzip.compress(body["identity"], compresslevel=6, mtime=0)
+            execution_cache.add_variant(cache_key, body, encoding, compressed)
+        headers["Content-Encoding"] = encoding
+        return Response(body[encoding], media_type="application/json", headers=headers)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/ingest")
+async def ingest_executions(request: Request) -> Dict[str, Any]:
+    """
+    Bulk ingest for HTTPStorage producers: {"executions": [...]} as JSON,
+    optionally gzip-encoded. Storage keeps one copy per execution_id, so a
+    batch re-sent after a client retry doesn't duplicate executions.
+    """
+    body = await request.body()
+    try:
+        if request.headers.get("content-encoding", "").lower() == "gzip":
+            body = gzip.decompress(body)
+        batch = json_loads(body)
+        if not isinstance(batch, dict) or not isinstance(batch.get("executions"), list):
+            raise ValueError('expected {"executions": [...]}')
+        for data in batch["executions"]:
+            validate_execution_dict(data)
+        executions = [execution_from_dict(data) for data in batch["executions"]]
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid ingest batch: {e}")
+    try:
+        await asyncio.to_thread(xray.ingest_executions, executions)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"ingested": len(executions)}
+
+
+@app.get("/api/search")
+def search_executions(
+    response: Response,
+    q: Optional[str] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    name: Optional[str] = None,
+    step_name: Optional[str] = None,
+    asin: Optional[str] = None,
+    title: Optional[str] = None,
+    text: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Steps and candidates matching every term of `q` (reasoning, names, ASINs,
+    titles, rejection reasons), newest first, optionally restricted by column,
+    e.g. ?q=replacement&asin=B0COMP03 or ?text=price_range.
+    """
+    try:
+        hits = search_index.search(
+            q, limit=limit, cursor=cursor, name=name, step_name=step_name, asin=asin, title=title, text=text
+        )
+        if hits and len(hits) == limit:
+            response.headers["X-Next-Cursor"] = str(hits[-1]["document_id"])
+        return hits
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/metrics")
+def get_metrics() -> Dict[str, Any]:
+    """Metrics across all worker processes: this one live, the others as of their last snapshot."""
+    return metrics_snapshots.merged(xray.metrics_aggregator).snapshot()
+
+
 @app.get("/api/health")
 def health_check():
     return {"status": "ok"}
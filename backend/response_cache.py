@@ -0,0 +1,64 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+def _body_bytes(body: Dict[str, Any]) -> int:
+    return sum(len(value) for value in body.values() if isinstance(value, bytes))
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU of serialized response bodies: dicts holding the identity
+    bytes plus any compressed variants ("gzip", "br") next to small metadata.
+    Bounded by the total size of all their bytes, variants included.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def set(self, key: Hashable, body: Dict[str, Any]) -> None:
+        with self._lock:
+            self._discard(key)
+            if _body_bytes(body) > self.max_bytes:
+                return
+            self._entries[key] = body
+            self.size += _body_bytes(body)
+            self._evict()
+
+    def add_variant(self, key: Hashable, body: Dict[str, Any], encoding: str, data: bytes) -> None:
+        """Store `data` as body[encoding], counting it against the cache if `body` is the entry cached under `key`."""
+        with self._lock:
+            previous = body.get(encoding)
+            body[encoding] = data
+            if self._entries.get(key) is body:
+                self.size += len(data) - (len(previous) if isinstance(previous, bytes) else 0)
+                self._evict()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _discard(self, key: Hashable) -> None:
+        body = self._entries.pop(key, None)
+        if body is not None:
+            self.size -= _body_bytes(body)
+
+    def _evict(self) -> None:
+        while self.size > self.max_bytes and self._entries:
+            _, body = self._entries.popitem(last=False)
+            self.size -= _body_bytes(body)
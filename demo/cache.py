@@ -0,0 +1,114 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Hashable, Optional
+
+MISS = object()
+
+
+def _cache_key(key: Hashable) -> str:
+    return json.dumps(key, separators=(",", ":"), default=str)
+
+
+class LRUCache:
+    """Thread-safe in-memory cache with LRU eviction and a per-entry TTL."""
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: Optional[float] = 300.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISS
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return MISS
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds is not None else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskCache:
+    """SQLite-backed cache for JSON-serializable values, shared across processes and restarts."""
+
+    def __init__(self, path: str, ttl_seconds: Optional[float] = 86400.0):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)")
+
+    def get(self, key: Hashable) -> Any:
+        row = self._connection().execute(
+            "SELECT value, expires_at FROM cache WHERE key = ?", (_cache_key(key),)
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return MISS
+        return json.loads(row[0])
+
+    def set(self, key: Hashable, value: Any) -> None:
+        expires_at = time.time() + self.ttl_seconds if self.ttl_seconds is not None else None
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (_cache_key(key), json.dumps(value, default=str), expires_at),
+            )
+
+    def clear(self) -> None:
+        with self._connection() as conn:
+            conn.execute("DELETE FROM cache")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+
+class TieredCache:
+    """Memory tier in front of a slower (e.g. disk) tier; disk hits are promoted to memory."""
+
+    def __init__(self, memory: LRUCache, disk: DiskCache):
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key: Hashable) -> Any:
+        value = self.memory.get(key)
+        if value is MISS:
+            value = self.disk.get(key)
+            if value is not MISS:
+                self.memory.set(key, value)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self.memory.set(key, value)
+        self.disk.set(key, value)
+
+    def clear(self) -> None:
+        self.memory.clear()
+        self.disk.clear()
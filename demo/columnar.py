@@ -0,0 +1,79 @@
+import heapq
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Below this many candidates, building the arrays costs more than the plain loop saves.
+VECTORIZE_MIN_CANDIDATES = 256
+
+
+def _use_columnar(candidates: list) -> bool:
+    return np is not None and len(candidates) >= VECTORIZE_MIN_CANDIDATES
+
+
+def _column(candidates: list, field: str) -> "np.ndarray":
+    return np.fromiter((candidate[field] for candidate in candidates), dtype=np.float64, count=len(candidates))
+
+
+def filter_masks(
+    candidates: list, price_min: float, price_max: float, min_rating: float, min_reviews: int
+) -> Tuple[List[bool], List[bool], List[bool]]:
+    """Per-candidate (price, rating, reviews) pass flags, in candidate order."""
+    if _use_columnar(candidates):
+        prices = _column(candidates, "price")
+        return (
+            ((prices >= price_min) & (prices <= price_max)).tolist(),
+            (_column(candidates, "rating") >= min_rating).tolist(),
+            (_column(candidates, "reviews") >= min_reviews).tolist(),
+        )
+    return (
+        [price_min <= candidate["price"] <= price_max for candidate in candidates],
+        [candidate["rating"] >= min_rating for candidate in candidates],
+        [candidate["reviews"] >= min_reviews for candidate in candidates],
+    )
+
+
+def rank_scores(
+    candidates: list, reference_price: float, weights: Dict[str, float], top_k: Optional[int] = None
+) -> List[Tuple[int, float, float, float, float]]:
+    """
+    Score candidates and return (index, review_score, rating_score,
+    price_proximity_score, total_score) for the `top_k` best (all when None),
+    highest total first. Ties keep candidate order, like a stable sort.
+    """
+    if top_k is not None and top_k <= 0:
+        return []
+    if _use_columnar(candidates):
+        review = np.minimum(_column(candidates, "reviews") / 10000.0, 1.0)
+        rating = (_column(candidates, "rating") - 3.0) / 2.0
+        price = np.maximum(0.0, 1.0 - (np.abs(_column(candidates, "price") - reference_price) / reference_price))
+        total = weights["review_count"] * review + weights["rating"] * rating + weights["price_proximity"] * price
+
+        if top_k is None or top_k >= len(candidates):
+            order = np.argsort(-total, kind="stable")
+        else:
+            partitioned = np.argpartition(-total, top_k - 1)
+            kth = total[partitioned[top_k - 1]]
+            above = np.flatnonzero(total > kth)
+            ties = np.flatnonzero(total == kth)[:top_k - len(above)]
+            chosen = np.concatenate([above, ties])
+            order = chosen[np.lexsort((chosen, -total[chosen]))]
+
+        return list(zip(
+            order.tolist(), review[order].tolist(), rating[order].tolist(), price[order].tolist(), total[order].tolist()
+        ))
+
+    scored = []
+    for index, candidate in enumerate(candidates):
+        review_score = min(candidate["reviews"] / 10000.0, 1.0)
+        rating_score = (candidate["rating"] - 3.0) / 2.0
+        price_score = max(0, 1.0 - (abs(candidate["price"] - reference_price) / reference_price))
+        total_score = weights["review_count"] * review_score + weights["rating"] * rating_score + weights["price_proximity"] * price_score
+        scored.append((index, review_score, rating_score, price_score, total_score))
+
+    if top_k is None:
+        return sorted(scored, key=lambda item: item[4], reverse=True)
+    return heapq.nlargest(top_k, scored, key=lambda item: item[4])
@@ -1,11 +1,18 @@
+import contextvars
+import functools
 import sys
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from xray_sdk import XRay
+from xray_sdk import XRay, entity_ref
 from xray_sdk.storage import JSONFileStorage
+from demo.cache import MISS, LRUCache
+from demo.columnar import filter_masks, rank_scores
+from demo.keyword_matcher import CAPACITY_PATTERN, MATERIAL_PATTERN, KeywordMatcher
 
 MOCK_PRODUCTS = [
     {"asin": "B0COMP01", "title": "HydroFlask 32oz Wide Mouth", "price": 44.99, "rating": 4.5, "reviews": 8932, "category": "Sports & Outdoors"},
@@ -24,6 +31,20 @@ PRODUCT_TYPE_KEYWORDS = {
     "lamp": ["desk lamp", "desk lighting", "table lamp", "office lamp", "task lighting"],
 }
 
+# Built once at import; rebuild it (and call _generate_keywords.cache_clear()) if the table changes.
+PRODUCT_TYPE_MATCHER = KeywordMatcher(PRODUCT_TYPE_KEYWORDS)
+
+SEARCH_MAX_CONCURRENCY = 8
+SEARCH_TIMEOUT_S = 1.0
+
+# Any object with get(key) -> value | MISS and set(key, value) works here, e.g. a
+# TieredCache(LRUCache(...), DiskCache(...)) from demo.cache; set to None to disable.
+SEARCH_CACHE = LRUCache(max_entries=10000, ttl_seconds=300.0)
+RELEVANCE_CACHE = LRUCache(max_entries=100000, ttl_seconds=3600.0)
+
+# Number of ranked candidates recorded by rank_and_select; None records all of them.
+RANKING_TOP_K = None
+
 CATEGORY_KEYWORDS = {
     "Electronics": ["electronics", "electronic device", "tech product"],
     "Computer Accessories": ["computer accessories", "tech accessories", "desk accessories"],
@@ -37,14 +58,18 @@ def _deduplicate_keywords(keywords: list) -> list:
     return [kw for kw in keywords if kw and (kw.lower() not in seen and not seen.add(kw.lower()))]
 
 
-def _extract_capacity(words: list) -> str:
-    for word in words:
-        if any(unit in word.lower() for unit in ["oz", "ml", "liter"]):
-            return word.lower()
-    return None
+def _extract_capacity(title_lower: str) -> str:
+    match = CAPACITY_PATTERN.search(title_lower)
+    return match.group() if match else None
 
 
 def generate_keywords(title: str, category: str) -> tuple:
+    keywords, metadata = _generate_keywords(title, category)
+    return list(keywords), dict(metadata)
+
+
+@functools.lru_cache(maxsize=4096)
+def _generate_keywords(title: str, category: str) -> tuple:
     title_lower = title.lower()
     words = title.split()
     keywords = [title_lower]
@@ -52,22 +77,22 @@ def generate_keywords(title: str, category: str) -> tuple:
     matched_category = None
     extraction_method = None
     
-    for product_type, base_keywords in PRODUCT_TYPE_KEYWORDS.items():
-        if product_type in title_lower:
-            matched_type = product_type
-            keywords.extend(base_keywords)
-            
-            if product_type == "water bottle":
-                material = "stainless steel" if "stainless" in title_lower else ("titanium" if "titanium" in title_lower else "plastic")
-                capacity = _extract_capacity(words)
-                keywords[1] = "insulated bottle" if "insulated" in title_lower else keywords[1]
-                if material not in keywords:
-                    keywords.insert(2, material)
-                if capacity:
-                    keywords.insert(3, capacity)
-            
-            extraction_method = "product_type_match"
-            break
+    product_type = PRODUCT_TYPE_MATCHER.first_match(title_lower)
+    if product_type is not None:
+        matched_type = product_type
+        keywords.extend(PRODUCT_TYPE_KEYWORDS[product_type])
+        
+        if product_type == "water bottle":
+            materials = set(MATERIAL_PATTERN.findall(title_lower))
+            material = "stainless steel" if "stainless" in materials else ("titanium" if "titanium" in materials else "plastic")
+            capacity = _extract_capacity(title_lower)
+            keywords[1] = "insulated bottle" if "insulated" in title_lower else keywords[1]
+            if material not in keywords:
+                keywords.insert(2, material)
+            if capacity:
+                keywords.insert(3, capacity)
+        
+        extraction_method = "product_type_match"
     
     if not extraction_method and category in CATEGORY_KEYWORDS:
         matched_category = category
@@ -81,7 +106,7 @@ def generate_keywords(title: str, category: str) -> tuple:
     
     unique_keywords = _deduplicate_keywords(keywords)
     
-    return unique_keywords, {
+    return tuple(unique_keywords), {
         "extraction_method": extraction_method,
         "matched_product_type": matched_type,
         "matched_category": matched_category,
@@ -95,24 +120,149 @@ def search_products(keyword: str, category: str = None, limit: int = 50) -> list
     return MOCK_PRODUCTS[:limit]
 
 
+def search_keywords_concurrently(
+    keywords: list,
+    xray: XRay = None,
+    category: str = None,
+    limit: int = 50,
+    max_concurrency: int = SEARCH_MAX_CONCURRENCY,
+    timeout: float = SEARCH_TIMEOUT_S,
+    shared_results: dict = None
+) -> tuple:
+    """
+    Run search_products for every keyword on a bounded thread pool, merging and
+    deduplicating by ASIN as each search completes. Calls still running after
+    `timeout` seconds are abandoned and reported with status "timeout".
+    
+    With `xray`, each search is recorded as a child step of the current step,
+    except abandoned ones: they finish after this returns, possibly after the
+    execution has ended, so their steps are discarded.
+    `shared_results`, keyed by (keyword, category, limit), serves keywords that
+    were already searched and collects new successful results for later callers.
+    SEARCH_CACHE is consulted under the same key; hits report status "cache_hit".
+    """
+    def traced_search(keyword: str) -> list:
+        started[keyword] = time.perf_counter()
+        if xray is None:
+            return search_products(keyword, category=category, limit=limit)
+        with xray.step("search_products", inputs={"keyword": keyword, "category": category, "limit": limit}) as search_step:
+            try:
+                results = search_products(keyword, category=category, limit=limit)
+                search_step.outputs = {"result_count": len(results), "asins": [r["asin"] for r in results]}
+            finally:
+                # Either the search finishes in time and is recorded, or the wait loop has given up on it.
+                with timeout_lock:
+                    if keyword in timed_out:
+                        search_step.discard()
+                    else:
+                        finished.add(keyword)
+        return results
+    
+    def merge(keyword: str, results: list) -> None:
+        keyword_stats[keyword]["hits"] = len(results)
+        for candidate in results:
+            if candidate["asin"] not in seen:
+                seen.add(candidate["asin"])
+                unique_candidates.append(candidate)
+                keyword_stats[keyword]["new_unique"] += 1
+    
+    started = {}
+    finished = set()
+    timed_out = set()
+    timeout_lock = threading.Lock()
+    keyword_stats = {keyword: {"hits": 0, "new_unique": 0, "latency_ms": None, "status": "pending"} for keyword in keywords}
+    unique_candidates = []
+    seen = set()
+    
+    to_search = []
+    for keyword in keywords:
+        key = (keyword, category, limit)
+        shared = shared_results.get(key) if shared_results is not None else None
+        if shared is not None:
+            keyword_stats[keyword].update(status="shared", latency_ms=0.0)
+            merge(keyword, shared)
+            continue
+        cached = SEARCH_CACHE.get(key) if SEARCH_CACHE is not None else MISS
+        if cached is not MISS:
+            keyword_stats[keyword].update(status="cache_hit", latency_ms=0.0)
+            merge(keyword, cached)
+            continue
+        to_search.append(keyword)
+    if not to_search:
+        return unique_candidates, keyword_stats
+    
+    pool = ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(to_search))))
+    try:
+        futures = {pool.submit(contextvars.copy_context().run, traced_search, keyword): keyword for keyword in to_search}
+        pending = set(futures)
+        while pending:
+            now = time.perf_counter()
+            running = [started[futures[f]] for f in pending if futures[f] in started and futures[f] not in finished]
+            wait_for = max(0.0, min(running) + timeout - now) if running else timeout
+            done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+            
+            for future in done:
+                keyword = futures[future]
+                stats = keyword_stats[keyword]
+                stats["latency_ms"] = (time.perf_counter() - started.get(keyword, now)) * 1000
+                try:
+                    results = future.result()
+                except Exception as e:
+                    stats.update(status="error", error=str(e))
+                    continue
+                stats["status"] = "success"
+                merge(keyword, results)
+                if shared_results is not None:
+                    shared_results[(keyword, category, limit)] = results
+                if SEARCH_CACHE is not None:
+                    SEARCH_CACHE.set((keyword, category, limit), results)
+            
+            now = time.perf_counter()
+            with timeout_lock:
+                for future in list(pending):
+                    keyword = futures[future]
+                    if keyword in started and keyword not in finished and now - started[keyword] >= timeout:
+                        timed_out.add(keyword)
+                        pending.discard(future)
+                        keyword_stats[keyword].update(status="timeout", latency_ms=(now - started[keyword]) * 1000)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    
+    return unique_candidates, keyword_stats
+
+
+FILTER_NAMES = ("price_range", "min_rating", "min_reviews")
+
+
+def _filter_thresholds(reference: dict) -> dict:
+    return {"price_min": reference["price"] * 0.5, "price_max": reference["price"] * 2.0, "min_rating": 3.8, "min_reviews": 100}
+
+
 def apply_filters(candidates: list, reference: dict) -> tuple:
-    price_min = reference["price"] * 0.5
-    price_max = reference["price"] * 2.0
-    min_rating = 3.8
-    min_reviews = 100
+    """
+    (qualified candidates, masks): masks holds the price_range, min_rating and
+    min_reviews pass flags per candidate. Explanations are built separately by
+    explain_filters, only when they are recorded.
+    """
+    thresholds = _filter_thresholds(reference)
+    masks = filter_masks(candidates, thresholds["price_min"], thresholds["price_max"], thresholds["min_rating"], thresholds["min_reviews"])
+    qualified = [candidate for candidate, *passed in zip(candidates, *masks) if all(passed)]
+    return qualified, masks
+
+
+def explain_filters(candidates: list, reference: dict, masks: tuple) -> list:
+    """Per-candidate evaluation records, with a detail message per filter."""
+    thresholds = _filter_thresholds(reference)
+    price_range = f"${thresholds['price_min']:.2f}-${thresholds['price_max']:.2f}"
+    min_rating = thresholds["min_rating"]
+    min_reviews = thresholds["min_reviews"]
     
     evaluations = []
-    qualified = []
-    
-    for candidate in candidates:
-        passed_price = price_min <= candidate["price"] <= price_max
-        passed_rating = candidate["rating"] >= min_rating
-        passed_reviews = candidate["reviews"] >= min_reviews
-        
+    for candidate, passed_price, passed_rating, passed_reviews in zip(candidates, *masks):
         filter_results = {
             "price_range": {
                 "passed": passed_price,
-                "detail": f"${candidate['price']:.2f} {'is within' if passed_price else 'is outside'} ${price_min:.2f}-${price_max:.2f}"
+                "detail": f"${candidate['price']:.2f} {'is within' if passed_price else 'is outside'} {price_range}"
             },
             "min_rating": {
                 "passed": passed_rating,
@@ -123,91 +273,117 @@ def apply_filters(candidates: list, reference: dict) -> tuple:
                 "detail": f"{candidate['reviews']} {'>=' if passed_reviews else '<'} {min_reviews} minimum"
             }
         }
-        
-        is_qualified = passed_price and passed_rating and passed_reviews
-        
         evaluations.append({
             "asin": candidate["asin"],
             "title": candidate["title"],
             "metrics": {"price": candidate["price"], "rating": candidate["rating"], "reviews": candidate["reviews"]},
             "filter_results": filter_results,
-            "qualified": is_qualified
+            "qualified": passed_price and passed_rating and passed_reviews
         })
-        
-        if is_qualified:
-            qualified.append(candidate)
-    
-    return qualified, evaluations
+    return evaluations
 
 
 def llm_relevance_evaluation(candidates: list, reference: dict) -> tuple:
-    time.sleep(0.2)
-    confirmed = []
-    evaluations = []
-    rejected = []
+    return llm_relevance_evaluation_batch([(candidates, reference)])[0]
+
+
+def llm_relevance_evaluation_batch(jobs: list) -> list:
+    """
+    Evaluate several (candidates, reference) pairs in one simulated LLM call.
+    Decisions cached in RELEVANCE_CACHE under (asin, reference category) are
+    reused and marked "from_cache"; the call is only made if something misses.
+    """
+    cache = RELEVANCE_CACHE
+    lookups = []
+    for candidates, reference in jobs:
+        reference_category = reference.get("category", "Sports & Outdoors")
+        lookups.append([
+            cache.get((candidate["asin"], reference_category)) if cache is not None else MISS
+            for candidate in candidates
+        ])
+    
+    if any(cached is MISS for job in lookups for cached in job):
+        time.sleep(0.2)
     
-    reference_category = reference.get("category", "Sports & Outdoors")
+    results = []
+    for (candidates, reference), job in zip(jobs, lookups):
+        reference_category = reference.get("category", "Sports & Outdoors")
+        confirmed = []
+        evaluations = []
+        rejected = []
+        for candidate, cached in zip(candidates, job):
+            if cached is MISS:
+                eval_data = _evaluate_candidate(candidate, reference_category)
+                if cache is not None:
+                    cache.set((candidate["asin"], reference_category), eval_data)
+                eval_data = dict(eval_data, from_cache=False)
+            else:
+                eval_data = dict(cached, from_cache=True)
+            
+            evaluations.append(eval_data)
+            if eval_data["is_competitor"]:
+                confirmed.append(candidate)
+            else:
+                rejected.append({"asin": candidate["asin"], "title": candidate["title"], "rejection_reasons": eval_data["rejection_reasons"]})
+        results.append((confirmed, evaluations, rejected))
+    return results
+
+
+def _evaluate_candidate(candidate: dict, reference_category: str) -> dict:
     rejection_patterns = [
         ("accessory", "title contains 'accessory' - likely an accessory, not a main product"),
         ("replacement", "title contains 'replacement' - likely a replacement part, not a main product"),
     ]
     
-    for candidate in candidates:
-        title_lower = candidate["title"].lower()
-        rejection_reasons = [
-            reason for pattern, reason in rejection_patterns if pattern in title_lower
-        ]
-        
-        if candidate["category"] != reference_category:
-            rejection_reasons.append(f"category mismatch: '{candidate['category']}' != '{reference_category}'")
-        
-        is_competitor = not rejection_reasons
-        eval_data = {
-            "asin": candidate["asin"],
-            "title": candidate["title"],
-            "category": candidate["category"],
-            "is_competitor": is_competitor,
-            "confidence": 0.95 if is_competitor else 0.85
-        }
-        
-        if rejection_reasons:
-            eval_data["rejection_reasons"] = rejection_reasons
-            rejected.append({"asin": candidate["asin"], "title": candidate["title"], "rejection_reasons": rejection_reasons})
-        else:
-            eval_data["accepted_reason"] = f"Passed all checks: main product in category '{reference_category}'"
-        
-        evaluations.append(eval_data)
-        if is_competitor:
-            confirmed.append(candidate)
+    title_lower = candidate["title"].lower()
+    rejection_reasons = [
+        reason for pattern, reason in rejection_patterns if pattern in title_lower
+    ]
+    
+    if candidate["category"] != reference_category:
+        rejection_reasons.append(f"category mismatch: '{candidate['category']}' != '{reference_category}'")
     
-    return confirmed, evaluations, rejected
+    is_competitor = not rejection_reasons
+    eval_data = {
+        "asin": candidate["asin"],
+        "title": candidate["title"],
+        "category": candidate["category"],
+        "is_competitor": is_competitor,
+        "confidence": 0.95 if is_competitor else 0.85
+    }
+    
+    if rejection_reasons:
+        eval_data["rejection_reasons"] = rejection_reasons
+    else:
+        eval_data["accepted_reason"] = f"Passed all checks: main product in category '{reference_category}'"
+    
+    return eval_data
 
 
-def rank_and_select(candidates: list, reference: dict) -> tuple:
+def rank_and_select(candidates: list, reference: dict, top_k: int = None) -> tuple:
+    """
+    Rank candidates by weighted score. With `top_k`, only the best `top_k` are
+    ranked and returned, so records are never built for the rest.
+    """
     if not candidates:
         return None, []
     
     RANKING_WEIGHTS = {"review_count": 0.5, "rating": 0.3, "price_proximity": 0.2}
     
     ranked = []
-    for candidate in candidates:
-        review_score = min(candidate["reviews"] / 10000.0, 1.0)
-        rating_score = (candidate["rating"] - 3.0) / 2.0
-        price_score = max(0, 1.0 - (abs(candidate["price"] - reference["price"]) / reference["price"]))
-        total_score = RANKING_WEIGHTS["review_count"] * review_score + RANKING_WEIGHTS["rating"] * rating_score + RANKING_WEIGHTS["price_proximity"] * price_score
-        
+    for rank, (index, review_score, rating_score, price_score, total_score) in enumerate(
+        rank_scores(candidates, reference["price"], RANKING_WEIGHTS, top_k), 1
+    ):
+        candidate = candidates[index]
         ranked.append({
             "asin": candidate["asin"],
             "title": candidate["title"],
             "metrics": {"price": candidate["price"], "rating": candidate["rating"], "reviews": candidate["reviews"]},
             "score_breakdown": {"review_count_score": review_score, "rating_score": rating_score, "price_proximity_score": price_score},
-            "total_score": total_score
+            "total_score": total_score,
+            "rank": rank
         })
     
-    ranked.sort(key=lambda x: x["total_score"], reverse=True)
-    for i, item in enumerate(ranked, 1):
-        item["rank"] = i
-    
     return ranked[0] if ranked else None, ranked
 
 
@@ -250,23 +426,22 @@ def _build_ranking_reasoning(selected: dict, ranked_count: int) -> str:
     return f"No competitor selected: empty candidate list"
 
 
-def _extract_failed_filters(evaluations: list) -> tuple:
-    failed_by_filter = {"price_range": 0, "min_rating": 0, "min_reviews": 0}
+def _count_failed_filters(masks: tuple) -> dict:
+    """Failures per filter; any failed filter disqualifies, so these are all among failed candidates."""
+    return {name: len(mask) - sum(mask) for name, mask in zip(FILTER_NAMES, masks)}
+
+
+def _failed_candidates(candidates: list, masks: tuple) -> list:
     failed_candidates = []
-    
-    for eval_item in evaluations:
-        if not eval_item["qualified"]:
-            failed_filters = [name for name, result in eval_item["filter_results"].items() if not result["passed"]]
-            for name in failed_filters:
-                failed_by_filter[name] = failed_by_filter.get(name, 0) + 1
+    for candidate, *passed in zip(candidates, *masks):
+        if not all(passed):
             failed_candidates.append({
-                "asin": eval_item["asin"],
-                "title": eval_item["title"],
-                "failed_filters": failed_filters,
-                "metrics": eval_item["metrics"]
+                "asin": candidate["asin"],
+                "title": candidate["title"],
+                "failed_filters": [name for name, ok in zip(FILTER_NAMES, passed) if not ok],
+                "metrics": {"price": candidate["price"], "rating": candidate["rating"], "reviews": candidate["reviews"]}
             })
-    
-    return failed_by_filter, failed_candidates
+    return failed_candidates
 
 
 def _extract_rejection_summary(rejected: list) -> dict:
@@ -278,146 +453,241 @@ def _extract_rejection_summary(rejected: list) -> dict:
     return summary
 
 
+CANDIDATE_IDENTITY_FIELDS = ("asin", "title", "category")
+
+
+def _candidate_ref(record: dict, entities: dict) -> dict:
+    """
+    Entity reference standing in for the identity fields (asin, title, category)
+    of a per-candidate record; everything else, metrics included, stays inline
+    so the expanded record keeps its shape.
+    """
+    entity = entities[record["asin"]]
+    shared = [key for key in CANDIDATE_IDENTITY_FIELDS if key in record and entity.get(key) == record[key]]
+    return entity_ref(record["asin"], shared, **{key: value for key, value in record.items() if key not in shared})
+
+
 def _get_reference_summary(reference: dict, fields: list) -> dict:
     return {field: reference.get(field) for field in fields}
 
 
-def find_competitor(reference_product: dict, xray: XRay) -> dict:
-    exec_id = xray.start_execution(
-        "competitor_selection",
-        metadata={"reference_product_id": reference_product.get("asin", "UNKNOWN")}
-    )
-    
-    try:
-        step_start = time.time()
+def _keyword_stage(xray: XRay, reference_product: dict, execution_id: str = None) -> list:
+    with xray.step(
+        "keyword_generation",
+        inputs={"product_title": reference_product["title"], "category": reference_product["category"]},
+        execution_id=execution_id
+    ) as step:
         keywords, keyword_metadata = generate_keywords(reference_product["title"], reference_product["category"])
-        step_duration = (time.time() - step_start) * 1000
-        
-        xray.add_step(
-            exec_id, "keyword_generation",
-            inputs={"product_title": reference_product["title"], "category": reference_product["category"]},
-            outputs={"keywords": keywords, "model": "gpt-4 (simulated)", "keyword_count": len(keywords)},
-            reasoning=_build_keyword_reasoning(keywords, keyword_metadata),
-            metadata=keyword_metadata,
-            duration_ms=step_duration
-        )
-        
-        step_start = time.time()
-        all_candidates = []
-        for keyword in keywords[:1]:
-            all_candidates.extend(search_products(keyword, category=reference_product.get("category"), limit=3))
-        
-        unique_candidates = []
-        seen = set()
-        for c in all_candidates:
-            if c["asin"] not in seen:
-                seen.add(c["asin"])
-                unique_candidates.append(c)
-        step_duration = (time.time() - step_start) * 1000
-        
-        xray.add_step(
-            exec_id, "candidate_search",
-            inputs={"search_keyword": keywords[0], "category_filter": reference_product.get("category"), "limit": 3},
-            outputs={
-                "total_results_available": 2847,
-                "candidates_fetched": len(unique_candidates),
-                "status": "success" if unique_candidates else "no_results",
-                "candidates": unique_candidates
-            },
-            reasoning=f"Searched using keyword '{keywords[0]}' in category '{reference_product.get('category')}': found {len(unique_candidates)} unique candidates (2847 total matches available - mock data)",
-            duration_ms=step_duration
+        step.outputs = {"keywords": keywords, "model": "gpt-4 (simulated)", "keyword_count": len(keywords)}
+        step.reasoning = _build_keyword_reasoning(keywords, keyword_metadata)
+        step.metadata = keyword_metadata
+    return keywords
+
+
+def _search_stage(xray: XRay, reference_product: dict, keywords: list, execution_id: str = None, shared_results: dict = None) -> list:
+    with xray.step(
+        "candidate_search",
+        inputs={
+            "search_keywords": keywords,
+            "category_filter": reference_product.get("category"),
+            "limit": 3,
+            "max_concurrency": SEARCH_MAX_CONCURRENCY,
+            "timeout_s": SEARCH_TIMEOUT_S
+        },
+        execution_id=execution_id
+    ) as step:
+        unique_candidates, keyword_stats = search_keywords_concurrently(
+            keywords, xray, category=reference_product.get("category"), limit=3, shared_results=shared_results
         )
+        # A "summary" capture drops per-candidate lists, so don't build them for it.
+        detailed = xray.capture_level(execution_id) != "summary"
+        if detailed:
+            xray.add_entities({candidate["asin"]: candidate for candidate in unique_candidates}, execution_id)
+        total_hits = sum(stats["hits"] for stats in keyword_stats.values())
+        failed_keywords = [kw for kw, stats in keyword_stats.items() if stats["status"] not in ("success", "shared", "cache_hit")]
+        cache_hits = sum(1 for stats in keyword_stats.values() if stats["status"] == "cache_hit")
         
-        step_start = time.time()
-        qualified, evaluations = apply_filters(unique_candidates, reference_product)
-        step_duration = (time.time() - step_start) * 1000
-        failed_by_filter, failed_candidates = _extract_failed_filters(evaluations)
+        step.outputs = {
+            "total_results_available": 2847,
+            "keywords_searched": len(keywords),
+            "candidates_fetched": len(unique_candidates),
+            "status": "success" if unique_candidates else "no_results"
+        }
+        if detailed:
+            step.outputs["candidates"] = [entity_ref(candidate["asin"]) for candidate in unique_candidates]
+        step.reasoning = f"Searched {len(keywords)} keywords concurrently in category '{reference_product.get('category')}': {total_hits} results merged into {len(unique_candidates)} unique candidates" + (f", {len(failed_keywords)} searches failed or timed out" if failed_keywords else "") + " (2847 total matches available - mock data)"
+        step.metadata = {
+            "keyword_stats": keyword_stats,
+            "cache": {"hits": cache_hits, "misses": sum(1 for stats in keyword_stats.values() if stats["status"] in ("success", "error", "timeout"))}
+        }
+    return unique_candidates
+
+
+def _filter_stage(xray: XRay, reference_product: dict, candidates: list, execution_id: str = None) -> list:
+    with xray.step(
+        "apply_filters",
+        inputs={
+            "candidates_count": len(candidates),
+            "reference_product": _get_reference_summary(reference_product, ["asin", "title", "price", "category"]),
+            "filter_criteria": {"price_range": {"min": reference_product["price"] * 0.5, "max": reference_product["price"] * 2.0}, "min_rating": 3.8, "min_reviews": 100}
+        },
+        execution_id=execution_id
+    ) as step:
+        qualified, masks = apply_filters(candidates, reference_product)
+        failed_by_filter = _count_failed_filters(masks)
+        detailed = xray.capture_level(execution_id) != "summary"
         
-        xray.add_step(
-            exec_id, "apply_filters",
-            inputs={
-                "candidates_count": len(unique_candidates),
-                "reference_product": _get_reference_summary(reference_product, ["asin", "title", "price", "category"]),
-                "filter_criteria": {"price_range": {"min": reference_product["price"] * 0.5, "max": reference_product["price"] * 2.0}, "min_rating": 3.8, "min_reviews": 100}
-            },
-            outputs={
-                "total_evaluated": len(unique_candidates),
-                "passed": len(qualified),
-                "failed": len(unique_candidates) - len(qualified),
-                "status": "success" if qualified else "all_failed"
-            },
-            reasoning=_build_filter_reasoning(len(unique_candidates), len(qualified), failed_by_filter),
-            metadata={
-                "filters_applied": {
-                    "price_range": {"min": reference_product["price"] * 0.5, "max": reference_product["price"] * 2.0, "rule": "0.5x - 2x of reference price"},
-                    "min_rating": {"value": 3.8, "rule": "Must be at least 3.8 stars"},
-                    "min_reviews": {"value": 100, "rule": "Must have at least 100 reviews"}
-                },
-                "evaluations": evaluations,
-                "failed_by_filter": failed_by_filter,
-                "failed_candidates": failed_candidates
+        step.outputs = {
+            "total_evaluated": len(candidates),
+            "passed": len(qualified),
+            "failed": len(candidates) - len(qualified),
+            "status": "success" if qualified else "all_failed"
+        }
+        step.reasoning = _build_filter_reasoning(len(candidates), len(qualified), failed_by_filter)
+        step.metadata = {
+            "filters_applied": {
+                "price_range": {"min": reference_product["price"] * 0.5, "max": reference_product["price"] * 2.0, "rule": "0.5x - 2x of reference price"},
+                "min_rating": {"value": 3.8, "rule": "Must be at least 3.8 stars"},
+                "min_reviews": {"value": 100, "rule": "Must have at least 100 reviews"}
             },
-            duration_ms=step_duration
-        )
-        
-        step_start = time.time()
-        confirmed, llm_evaluations, rejected = llm_relevance_evaluation(qualified, reference_product)
-        step_duration = (time.time() - step_start) * 1000
+            "failed_by_filter": failed_by_filter
+        }
+        if detailed:
+            entities = {candidate["asin"]: candidate for candidate in candidates}
+            evaluations = explain_filters(candidates, reference_product, masks)
+            step.metadata["evaluations"] = [_candidate_ref(evaluation, entities) for evaluation in evaluations]
+            step.metadata["failed_candidates"] = [_candidate_ref(candidate, entities) for candidate in _failed_candidates(candidates, masks)]
+    return qualified
+
+
+def _relevance_stage(xray: XRay, reference_product: dict, qualified: list, execution_id: str = None, batch_result: tuple = None, batch_info: dict = None) -> list:
+    with xray.step(
+        "llm_relevance_evaluation",
+        inputs={
+            "candidates_count": len(qualified),
+            "reference_category": reference_product.get("category"),
+            "model": "gpt-4 (simulated)"
+        },
+        execution_id=execution_id
+    ) as step:
+        if batch_result is None:
+            confirmed, llm_evaluations, rejected = llm_relevance_evaluation(qualified, reference_product)
+        else:
+            confirmed, llm_evaluations, rejected = batch_result
         rejection_summary = _extract_rejection_summary(rejected) if rejected else {}
+        detailed = xray.capture_level(execution_id) != "summary"
         
-        xray.add_step(
-            exec_id, "llm_relevance_evaluation",
-            inputs={
-                "candidates_count": len(qualified),
-                "reference_category": reference_product.get("category"),
-                "model": "gpt-4 (simulated)"
-            },
-            outputs={
-                "total_evaluated": len(qualified),
-                "confirmed_competitors": len(confirmed),
-                "false_positives_removed": len(qualified) - len(confirmed),
-                "status": "success" if confirmed else "no_competitors_found"
-            },
-            reasoning=_build_llm_reasoning(len(qualified), len(confirmed), rejection_summary),
-            metadata={"evaluations": llm_evaluations, "rejected_candidates": rejected, "rejection_summary": rejection_summary},
-            duration_ms=step_duration
-        )
-        
-        step_start = time.time()
-        selected, ranked = rank_and_select(confirmed, reference_product)
-        step_duration = (time.time() - step_start) * 1000
-        RANKING_WEIGHTS = {"review_count": 0.5, "rating": 0.3, "price_proximity": 0.2}
-        
-        xray.add_step(
-            exec_id, "rank_and_select",
-            inputs={
-                "candidates_count": len(confirmed),
-                "reference_product": _get_reference_summary(reference_product, ["asin", "title", "price"]),
-                "ranking_weights": RANKING_WEIGHTS
-            },
-            outputs={
-                "selected_competitor": selected,
-                "ranked_count": len(ranked),
-                "status": "competitor_selected" if selected else "no_competitor_found"
-            } if selected else {
-                "selected_competitor": None,
-                "ranked_count": 0,
-                "status": "no_competitor_found",
-                "reason": "no_candidates_available" if not confirmed else "ranking_failed"
-            },
-            reasoning=_build_ranking_reasoning(selected, len(ranked)),
-            metadata={
-                "ranking_criteria": {"primary": "review_count", "secondary": "rating", "tertiary": "price_proximity"},
-                "ranking_weights": RANKING_WEIGHTS,
-                "ranked_candidates": ranked
-            },
-            duration_ms=step_duration
-        )
-        
-        return selected
+        step.outputs = {
+            "total_evaluated": len(qualified),
+            "confirmed_competitors": len(confirmed),
+            "false_positives_removed": len(qualified) - len(confirmed),
+            "status": "success" if confirmed else "no_competitors_found"
+        }
+        step.reasoning = _build_llm_reasoning(len(qualified), len(confirmed), rejection_summary)
+        cache_hits = sum(1 for evaluation in llm_evaluations if evaluation["from_cache"])
+        step.metadata = {
+            "rejection_summary": rejection_summary,
+            "cache": {"hits": cache_hits, "misses": len(llm_evaluations) - cache_hits}
+        }
+        if detailed:
+            entities = {candidate["asin"]: candidate for candidate in qualified}
+            step.metadata["evaluations"] = [_candidate_ref(evaluation, entities) for evaluation in llm_evaluations]
+            step.metadata["rejected_candidates"] = [_candidate_ref(candidate, entities) for candidate in rejected]
+        if batch_info:
+            step.metadata["batch"] = batch_info
+    return confirmed
+
+
+def _ranking_stage(xray: XRay, reference_product: dict, confirmed: list, execution_id: str = None) -> dict:
+    RANKING_WEIGHTS = {"review_count": 0.5, "rating": 0.3, "price_proximity": 0.2}
+    with xray.step(
+        "rank_and_select",
+        inputs={
+            "candidates_count": len(confirmed),
+            "reference_product": _get_reference_summary(reference_product, ["asin", "title", "price"]),
+            "ranking_weights": RANKING_WEIGHTS
+        },
+        execution_id=execution_id
+    ) as step:
+        selected, ranked = rank_and_select(confirmed, reference_product, RANKING_TOP_K)
+        detailed = xray.capture_level(execution_id) != "summary"
+        entities = {candidate["asin"]: candidate for candidate in confirmed}
         
-    finally:
-        xray.end_execution(exec_id)
+        step.outputs = {
+            "selected_competitor": _candidate_ref(selected, entities),
+            "ranked_count": len(ranked),
+            "status": "competitor_selected" if selected else "no_competitor_found"
+        } if selected else {
+            "selected_competitor": None,
+            "ranked_count": 0,
+            "status": "no_competitor_found",
+            "reason": "no_candidates_available" if not confirmed else "ranking_failed"
+        }
+        step.reasoning = _build_ranking_reasoning(selected, len(ranked))
+        step.metadata = {
+            "ranking_criteria": {"primary": "review_count", "secondary": "rating", "tertiary": "price_proximity"},
+            "ranking_weights": RANKING_WEIGHTS
+        }
+        if detailed:
+            step.metadata["ranked_candidates"] = [_candidate_ref(candidate, entities) for candidate in ranked]
+    return selected
+
+
+def find_competitor(reference_product: dict, xray: XRay) -> dict:
+    with xray.execution(
+        "competitor_selection",
+        metadata={"reference_product_id": reference_product.get("asin", "UNKNOWN")}
+    ):
+        keywords = _keyword_stage(xray, reference_product)
+        candidates = _search_stage(xray, reference_product, keywords)
+        qualified = _filter_stage(xray, reference_product, candidates)
+        confirmed = _relevance_stage(xray, reference_product, qualified)
+        return _ranking_stage(xray, reference_product, confirmed)
+
+
+def find_competitors_batch(reference_products: list, xray: XRay, batch_size: int = 100):
+    """
+    Run competitor selection for many reference products, yielding
+    (reference_product, selected_competitor) as each one finishes.
+    
+    Products are processed in chunks of `batch_size`: searches are shared between
+    products with the same (keyword, category), relevance is evaluated with one
+    batched LLM call per chunk, and each chunk's executions are saved with a
+    single save_executions call.
+    """
+    shared_results = {}
+    for chunk_start in range(0, len(reference_products), batch_size):
+        chunk = reference_products[chunk_start:chunk_start + batch_size]
+        execution_ids = [
+            xray.start_execution(
+                "competitor_selection",
+                metadata={"reference_product_id": reference.get("asin", "UNKNOWN"), "batch_size": len(chunk)}
+            )
+            for reference in chunk
+        ]
+        try:
+            keywords = [_keyword_stage(xray, reference, execution_id) for reference, execution_id in zip(chunk, execution_ids)]
+            
+            keywords_by_category = {}
+            for reference, product_keywords in zip(chunk, keywords):
+                keywords_by_category.setdefault(reference.get("category"), {}).update(dict.fromkeys(product_keywords))
+            for category, category_keywords in keywords_by_category.items():
+                search_keywords_concurrently(list(category_keywords), category=category, limit=3, shared_results=shared_results)
+            
+            qualified = []
+            for reference, execution_id, product_keywords in zip(chunk, execution_ids, keywords):
+                candidates = _search_stage(xray, reference, product_keywords, execution_id, shared_results=shared_results)
+                qualified.append(_filter_stage(xray, reference, candidates, execution_id))
+            
+            llm_start = time.perf_counter()
+            llm_results = llm_relevance_evaluation_batch(list(zip(qualified, chunk)))
+            batch_info = {"batch_size": len(chunk), "batch_latency_ms": (time.perf_counter() - llm_start) * 1000}
+            
+            for reference, execution_id, product_qualified, llm_result in zip(chunk, execution_ids, qualified, llm_results):
+                confirmed = _relevance_stage(xray, reference, product_qualified, execution_id, llm_result, batch_info)
+                yield reference, _ranking_stage(xray, reference, confirmed, execution_id)
+        finally:
+            xray.end_executions(execution_ids)
 
 
 if __name__ == "__main__":
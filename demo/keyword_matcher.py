@@ -0,0 +1,63 @@
+import re
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+CAPACITY_PATTERN = re.compile(r"\S*(?:oz|ml|liter)\S*")
+MATERIAL_PATTERN = re.compile(r"stainless|titanium")
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over a fixed list of patterns. Built once, it finds
+    substring matches in a single pass over the text, so lookup cost depends on
+    the text length rather than on how many patterns there are.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns: List[str] = list(patterns)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Lowest index of a pattern ending at each state, fail links included; -1 if none.
+        self._first: List[int] = [-1]
+
+        for index, pattern in enumerate(self.patterns):
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._first.append(-1)
+                state = next_state
+            if self._first[state] == -1:
+                self._first[state] = index
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                inherited = self._first[self._fail[next_state]]
+                if inherited != -1 and (self._first[next_state] == -1 or inherited < self._first[next_state]):
+                    self._first[next_state] = inherited
+
+    def first_match(self, text: str) -> Optional[str]:
+        """The earliest-listed pattern that occurs in `text`, or None."""
+        best = -1
+        state = 0
+        for char in text:
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            found = self._first[state]
+            if found != -1 and (best == -1 or found < best):
+                best = found
+                if best == 0:
+                    break
+        return self.patterns[best] if best != -1 else None
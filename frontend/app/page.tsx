@@ -17,6 +17,9 @@ interface Step {
   metadata?: any
   timestamp: string
   duration_ms?: number
+  step_id?: string
+  parent_step_id?: string | null
+  ended_at?: string
 }
 
 interface Execution {
@@ -28,25 +31,67 @@ interface Execution {
   metadata?: any
 }
 
+interface ExecutionSummary {
+  execution_id: string
+  name: string
+  started_at: string
+  ended_at?: string
+  step_count: number
+  total_duration_ms?: number
+  status?: string
+  downsampled?: boolean
+}
+
 const API_URL = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000"
 
 export default function Home() {
-  const [executions, setExecutions] = useState<Execution[]>([])
+  const [executions, setExecutions] = useState<ExecutionSummary[]>([])
   const [selectedExecution, setSelectedExecution] = useState<Execution | null>(null)
   const [loading, setLoading] = useState(true)
   const [filterType, setFilterType] = useState<string>("all")
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [selectError, setSelectError] = useState<string | null>(null)
 
   useEffect(() => {
     fetchExecutions()
   }, [])
 
+  useEffect(() => {
+    const source = new EventSource(`${API_URL}/api/executions/stream`)
+
+    source.addEventListener("step", (event) => {
+      const { execution_id, step } = JSON.parse((event as MessageEvent).data)
+      setSelectedExecution((current) =>
+        current && current.execution_id === execution_id ? { ...current, steps: [...current.steps, step] } : current
+      )
+    })
+
+    source.addEventListener("execution_ended", (event) => {
+      const { execution_id, retained, summary } = JSON.parse((event as MessageEvent).data)
+      if (!retained) return
+      setExecutions((current) => [summary, ...current.filter((e) => e.execution_id !== execution_id)])
+      setSelectedExecution((current) =>
+        current && current.execution_id === execution_id ? { ...current, ended_at: summary.ended_at } : current
+      )
+    })
+
+    // The server drops subscribers that fall too far behind; EventSource reconnects
+    // on its own, but events in between are lost, so reload the list.
+    source.addEventListener("dropped", () => {
+      fetchExecutions()
+    })
+
+    return () => source.close()
+  }, [])
+
   const fetchExecutions = async () => {
     try {
-      const response = await fetch(`${API_URL}/api/executions`)
+      const response = await fetch(`${API_URL}/api/executions/summary`)
       const data = await response.json()
       setExecutions(data)
+      setNextCursor(response.headers.get("X-Next-Cursor"))
       if (data.length > 0 && !selectedExecution) {
-        setSelectedExecution(data[0])
+        await selectExecution(data[0].execution_id)
       }
       setFilterType("all")
     } catch (error) {
@@ -56,6 +101,35 @@ export default function Home() {
     }
   }
 
+  const fetchMoreExecutions = async () => {
+    if (!nextCursor) return
+    try {
+      const response = await fetch(`${API_URL}/api/executions/summary?cursor=${encodeURIComponent(nextCursor)}`)
+      const data = await response.json()
+      setExecutions((current) => [...current, ...data])
+      setNextCursor(response.headers.get("X-Next-Cursor"))
+    } catch (error) {
+      console.error("Failed to fetch more executions:", error)
+    }
+  }
+
+  const selectExecution = async (executionId: string) => {
+    try {
+      const response = await fetch(`${API_URL}/api/executions/${executionId}`)
+      if (!response.ok) {
+        // e.g. 404 for an execution retention downsampled to its summary; keep showing the current one.
+        const { detail } = await response.json().catch(() => ({ detail: response.statusText }))
+        setSelectError(`Could not load execution ${executionId}: ${detail || `HTTP ${response.status}`}`)
+        return
+      }
+      setSelectedExecution(await response.json())
+      setSelectError(null)
+    } catch (error) {
+      console.error("Failed to fetch execution:", error)
+      setSelectError(`Could not load execution ${executionId}`)
+    }
+  }
+
   const formatTimestamp = (timestamp: string) => {
     return new Date(timestamp).toLocaleString()
   }
@@ -111,6 +185,26 @@ export default function Home() {
     return <span>{String(value)}</span>
   }
 
+  const getWaterfall = (execution: Execution) => {
+    const start = new Date(execution.started_at).getTime()
+    const end = execution.ended_at
+      ? new Date(execution.ended_at).getTime()
+      : Math.max(start, ...execution.steps.map((s) => new Date(s.timestamp).getTime() + (s.duration_ms || 0)))
+    const total = Math.max(end - start, 1)
+    const depthOf: Record<string, number> = {}
+    return execution.steps.map((step) => {
+      const depth = step.parent_step_id ? (depthOf[step.parent_step_id] ?? 0) + 1 : 0
+      if (step.step_id) depthOf[step.step_id] = depth
+      const offset = new Date(step.timestamp).getTime() - start
+      return {
+        step,
+        depth,
+        left: Math.min(Math.max((offset / total) * 100, 0), 100),
+        width: Math.max(((step.duration_ms || 0) / total) * 100, 0.5),
+      }
+    })
+  }
+
   const getFilteredCandidates = (step: Step, filterType: string) => {
     if (step.name !== "apply_filters" || filterType === "all" || !step.metadata?.evaluations) {
       return null
@@ -198,7 +292,7 @@ export default function Home() {
                     <button
                       key={exec.execution_id}
                       onClick={() => {
-                        setSelectedExecution(exec)
+                        selectExecution(exec.execution_id)
                         setFilterType("all")
                       }}
                       className={`w-full text-left p-3 rounded-lg border transition-colors ${
@@ -213,7 +307,7 @@ export default function Home() {
                       </div>
                       <div className="flex gap-2 mt-2">
                         <Badge variant="secondary" className="text-xs">
-                          {exec.steps.length} step{exec.steps.length !== 1 ? "s" : ""}
+                          {exec.step_count} step{exec.step_count !== 1 ? "s" : ""}
                         </Badge>
                         {exec.ended_at && (
                           <Badge variant="outline" className="text-xs">
@@ -228,6 +322,15 @@ export default function Home() {
                 )}
                 {executions.length > 0 && (
                   <div className="space-y-2 mt-4">
+                  {nextCursor && (
+                    <Button
+                      onClick={fetchMoreExecutions}
+                      variant="outline"
+                      className="w-full"
+                    >
+                      Load More
+                    </Button>
+                  )}
                   <Button
                     onClick={fetchExecutions}
                     variant="outline"
@@ -247,6 +350,9 @@ export default function Home() {
           </div>
 
           <div className="lg:col-span-2">
+            {selectError && (
+              <div className="mb-4 p-3 rounded-lg border border-destructive text-sm text-destructive">{selectError}</div>
+            )}
             {selectedExecution ? (
               <Card>
                 <CardHeader>
@@ -272,6 +378,23 @@ export default function Home() {
                   </div>
                 </CardHeader>
                 <CardContent>
+                  <div className="mb-6 space-y-1">
+                    <h4 className="font-semibold mb-2">Timeline</h4>
+                    {getWaterfall(selectedExecution).map(({ step, depth, left, width }, idx) => (
+                      <div key={step.step_id || idx} className="flex items-center gap-2 text-xs">
+                        <div className="w-48 truncate" style={{ paddingLeft: `${depth * 12}px` }}>
+                          {step.name}
+                        </div>
+                        <div className="relative flex-1 h-3 bg-muted rounded">
+                          <div
+                            className={`absolute h-3 rounded ${depth === 0 ? "bg-primary" : "bg-primary/50"}`}
+                            style={{ left: `${left}%`, width: `${Math.min(width, 100 - left)}%` }}
+                          />
+                        </div>
+                        <div className="w-16 text-right text-muted-foreground">{formatDuration(step.duration_ms)}</div>
+                      </div>
+                    ))}
+                  </div>
                   <Accordion type="single" collapsible className="w-full">
                     {selectedExecution.steps.map((step, idx) => {
                       const allFilterTypes = getAllFilterTypes(step)
@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+from demo.competitor_selection import find_competitor
+from xray_sdk import JSONFileStorage, SamplingPolicy, XRay, entity_ref
+
+CAPTURE_LEVELS = ["summary", "standard", "full"]
+
+REFERENCE_PRODUCT = {
+    "asin": "B0REF001",
+    "title": "Stainless Steel Water Bottle 32oz Insulated",
+    "price": 29.99,
+    "rating": 4.2,
+    "reviews": 1247,
+    "category": "Sports & Outdoors",
+}
+
+
+def make_xray(tmp_path, capture_level):
+    return XRay(storage=JSONFileStorage(str(tmp_path)), sampling=SamplingPolicy(capture_level=capture_level))
+
+
+def stored_execution(tmp_path, execution_id):
+    """Load through a fresh storage so nothing comes from in-memory state."""
+    return JSONFileStorage(str(tmp_path)).load_execution(execution_id).to_dict()
+
+
+@pytest.mark.parametrize("capture_level", CAPTURE_LEVELS)
+def test_capture_level_is_public(tmp_path, capture_level):
+    xray = make_xray(tmp_path, capture_level)
+    execution_id = xray.start_execution("test")
+    assert xray.capture_level(execution_id) == capture_level
+
+
+@pytest.mark.parametrize("capture_level", CAPTURE_LEVELS)
+def test_entity_refs_round_trip(tmp_path, capture_level):
+    xray = make_xray(tmp_path, capture_level)
+    execution_id = xray.start_execution("test")
+    xray.add_entities({"A": {"asin": "A", "title": "Bottle", "price": 10.0}}, execution_id)
+    xray.add_step(
+        execution_id,
+        "select",
+        {"candidates": [entity_ref("A"), entity_ref("A", ["title"])]},
+        {"selected": entity_ref("A"), "status": "ok"},
+    )
+    xray.end_execution(execution_id)
+
+    execution = stored_execution(tmp_path, execution_id)
+    assert "$ref" not in json.dumps(execution)
+    step = execution["steps"][0]
+    if capture_level == "summary":
+        assert step["outputs"]["selected"] == "A"
+    else:
+        assert step["outputs"]["selected"] == {"asin": "A", "title": "Bottle", "price": 10.0}
+        assert step["inputs"]["candidates"][1] == {"title": "Bottle"}
+
+
+@pytest.mark.parametrize("capture_level", CAPTURE_LEVELS)
+def test_demo_pipeline_leaves_no_unresolved_refs(tmp_path, capture_level):
+    xray = make_xray(tmp_path, capture_level)
+    find_competitor(REFERENCE_PRODUCT, xray)
+    execution_id = xray.list_execution_summaries(limit=1)[0]["execution_id"]
+
+    execution = stored_execution(tmp_path, execution_id)
+    assert "$ref" not in json.dumps(execution)
+    steps = {step["name"]: step for step in execution["steps"]}
+    if capture_level == "summary":
+        assert "evaluations" not in steps["apply_filters"]["metadata"]
+        assert "ranked_candidates" not in steps["rank_and_select"]["metadata"]
+    else:
+        evaluations = steps["apply_filters"]["metadata"]["evaluations"]
+        assert evaluations and all(isinstance(evaluation["asin"], str) for evaluation in evaluations)
+        assert steps["rank_and_select"]["metadata"]["ranked_candidates"]
@@ -0,0 +1,121 @@
+import json
+import multiprocessing
+from datetime import datetime, timedelta
+
+import pytest
+
+from xray_sdk import JSONFileStorage, RetentionPolicy, SegmentStorage, SQLiteStorage, XRay
+from xray_sdk.storage import decode_cursor, encode_cursor
+
+
+BACKENDS = {
+    "json": lambda path: JSONFileStorage(str(path)),
+    "sqlite": lambda path: SQLiteStorage(str(path / "xray.db")),
+    "segment": lambda path: SegmentStorage(str(path)),
+}
+
+
+def record_executions(storage, count, name="test"):
+    xray = XRay(storage=storage)
+    execution_ids = []
+    for i in range(count):
+        execution_id = xray.start_execution(name)
+        xray.add_step(execution_id, "step", {"i": i}, {"status": "ok"})
+        xray.end_execution(execution_id)
+        execution_ids.append(execution_id)
+    xray.flush()
+    return execution_ids
+
+
+def test_cursor_round_trip():
+    entry = {"started_at": "2024-01-01T00:00:00", "execution_id": "abc"}
+    assert decode_cursor(encode_cursor(entry)) == ("2024-01-01T00:00:00", "abc")
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "!!!",  # not base64
+        "bm90IGpzb24",  # "not json"
+        "bnVsbA",  # null
+        "eyJhIjoxfQ",  # {"a":1}
+        "WyJhIl0",  # ["a"]
+        "WyJhIiwiYiIsImMiXQ",  # ["a","b","c"]
+        "WzEsMl0",  # [1,2]
+    ],
+)
+def test_decode_cursor_rejects_malformed(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+def test_list_executions_rejects_malformed_cursor(tmp_path, backend):
+    storage = BACKENDS[backend](tmp_path)
+    record_executions(storage, 1)
+    with pytest.raises(ValueError):
+        storage.list_executions(cursor="WzEsMl0")
+    with pytest.raises(ValueError):
+        storage.list_execution_summaries(cursor="WzEsMl0")
+
+
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+def test_cursor_pages_cover_every_execution(tmp_path, backend):
+    storage = BACKENDS[backend](tmp_path)
+    execution_ids = record_executions(storage, 7)
+    seen, cursor = [], None
+    while True:
+        page = storage.list_execution_summaries(limit=3, cursor=cursor)
+        if not page:
+            break
+        seen.extend(summary["execution_id"] for summary in page)
+        cursor = encode_cursor(page[-1])
+    assert seen == execution_ids[::-1]
+
+
+def test_compact_keeps_summaries_of_legacy_index_entries(tmp_path):
+    execution_ids = record_executions(JSONFileStorage(str(tmp_path)), 3, name="legacy")
+    # Rewrite the index the way older versions stored it: index.json without summary fields.
+    entries = [
+        {key: entry[key] for key in ("execution_id", "name", "started_at", "ended_at")}
+        for entry in JSONFileStorage(str(tmp_path))._index.entries()
+    ]
+    (tmp_path / "index.jsonl").unlink()
+    (tmp_path / "index.json").write_text(json.dumps({"executions": entries}))
+
+    storage = JSONFileStorage(str(tmp_path))
+    result = storage.compact(RetentionPolicy(downsample_after_seconds=0), now=datetime.utcnow() + timedelta(days=1))
+
+    assert result == {"deleted": 0, "downsampled": 3}
+    summaries = storage.list_execution_summaries()
+    assert [summary["execution_id"] for summary in summaries] == execution_ids[::-1]
+    for summary in summaries:
+        assert summary["downsampled"] is True
+        assert summary["name"] == "legacy"
+        assert summary["step_count"] == 1
+        assert summary["status"] == "ok"
+        assert storage.load_execution(summary["execution_id"]) is None
+
+
+def _write_from_worker(path, count):
+    record_executions(JSONFileStorage(path), count, name="worker")
+
+
+def test_concurrent_processes_share_json_index(tmp_path):
+    workers, per_worker = 4, 25
+    processes = [
+        multiprocessing.Process(target=_write_from_worker, args=(str(tmp_path), per_worker))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=60)
+        assert process.exitcode == 0
+
+    storage = JSONFileStorage(str(tmp_path))
+    summaries = storage.list_execution_summaries(limit=workers * per_worker + 1)
+    execution_ids = {summary["execution_id"] for summary in summaries}
+    assert len(summaries) == len(execution_ids) == workers * per_worker
+    for execution_id in execution_ids:
+        assert storage.load_execution(execution_id) is not None
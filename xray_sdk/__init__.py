@@ -5,9 +5,20 @@ This library provides transparency into decision processes by capturing
 context at each step: inputs, candidates, filters, outcomes, and reasoning.
 """
 
-from .core import XRay, Execution, Step
+from .core import XRay, Execution, Step, StepRecorder, entity_ref
 from .storage import Storage, JSONFileStorage
+from .views import ExecutionView, StepView
+from .sqlite_storage import SQLiteStorage
+from .segment_storage import SegmentStorage
+from .buffered_storage import BufferedStorage
+from .http_storage import HTTPStorage
+from .search import SearchIndex, IndexedStorage
+from .aio import AsyncXRay
+from .sampling import SamplingPolicy
+from .retention import RetentionPolicy, RetentionCompactor
+from .metrics import MetricsAggregator, MetricsSnapshots, QuantileSketch
+from .events import EventBroker, Subscription
 
 __version__ = "1.0.0"
-__all__ = ["XRay", "Execution", "Step", "Storage", "JSONFileStorage"]
+__all__ = ["XRay", "Execution", "Step", "StepRecorder", "entity_ref", "ExecutionView", "StepView", "Storage", "JSONFileStorage", "SQLiteStorage", "SegmentStorage", "BufferedStorage", "HTTPStorage", "SearchIndex", "IndexedStorage", "AsyncXRay", "SamplingPolicy", "RetentionPolicy", "RetentionCompactor", "MetricsAggregator", "MetricsSnapshots", "QuantileSketch", "EventBroker", "Subscription"]
 
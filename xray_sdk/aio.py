@@ -0,0 +1,94 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, TYPE_CHECKING
+
+from .core import XRay, Execution, _current_execution
+
+if TYPE_CHECKING:
+    from .events import EventBroker
+    from .sampling import SamplingPolicy
+    from .storage import Storage
+
+
+class AsyncXRay:
+    """
+    asyncio front end for XRay. Recording steps only touches in-memory state and
+    never awaits, so coroutines sharing one instance can't interleave inside a
+    call; storage I/O goes through the storage's async methods, which run the
+    blocking backends in a worker thread.
+
+    Pass an existing XRay to share active executions with synchronous callers.
+    """
+
+    def __init__(
+        self,
+        xray: Optional[XRay] = None,
+        storage: Optional["Storage"] = None,
+        storage_path: Optional[str] = None,
+        sampling: Optional["SamplingPolicy"] = None,
+        events: Optional["EventBroker"] = None,
+    ):
+        self.xray = xray if xray is not None else XRay(
+            storage=storage, storage_path=storage_path, sampling=sampling, events=events
+        )
+
+    @property
+    def storage(self) -> "Storage":
+        return self.xray.storage
+
+    async def start_execution(self, name: str, metadata: Optional[Dict[str, Any]] = None) -> str:
+        return self.xray.start_execution(name, metadata)
+
+    @asynccontextmanager
+    async def execution(self, name: str, metadata: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        execution_id = await self.start_execution(name, metadata)
+        token = _current_execution.set(execution_id)
+        try:
+            yield execution_id
+        finally:
+            _current_execution.reset(token)
+            await self.end_execution(execution_id)
+
+    async def add_step(
+        self,
+        execution_id: Optional[str],
+        step_name: str,
+        inputs: Dict[str, Any],
+        outputs: Dict[str, Any],
+        reasoning: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        duration_ms: Optional[float] = None,
+        **step_fields: Any
+    ) -> str:
+        return self.xray.add_step(execution_id, step_name, inputs, outputs, reasoning, metadata, duration_ms, **step_fields)
+
+    async def add_entities(self, entities: Dict[str, Dict[str, Any]], execution_id: Optional[str] = None) -> None:
+        self.xray.add_entities(entities, execution_id)
+    
+    async def end_execution(self, execution_id: str) -> None:
+        execution = self.xray._finish_execution(execution_id)
+        if self.xray._retain(execution):
+            await self.storage.asave_execution(execution)
+
+    async def get_execution(self, execution_id: str) -> Optional[Execution]:
+        execution = self.xray._active_executions.get(execution_id)
+        if execution is not None:
+            return execution
+        return await self.storage.aload_execution(execution_id)
+
+    async def list_executions(self, limit: int = 100, cursor: Optional[str] = None, **filters: Any) -> List[Execution]:
+        return await self.storage.alist_executions(limit, cursor, **filters)
+
+    async def list_execution_summaries(
+        self, limit: int = 100, cursor: Optional[str] = None, **filters: Any
+    ) -> List[Dict[str, Any]]:
+        return await self.storage.alist_execution_summaries(limit, cursor, **filters)
+
+    def metrics(self) -> Dict[str, Any]:
+        return self.xray.metrics()
+    
+    async def flush(self) -> None:
+        await asyncio.to_thread(self.xray.flush)
+
+    async def close(self) -> None:
+        await asyncio.to_thread(self.xray.close)
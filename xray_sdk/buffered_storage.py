@@ -0,0 +1,188 @@
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, TYPE_CHECKING
+
+from .storage import Storage
+
+if TYPE_CHECKING:
+    from .core import Execution
+    from .retention import RetentionPolicy
+    from .views import ExecutionView
+
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("block", "drop_newest", "drop_oldest")
+
+
+class BufferedStorage(Storage):
+    """
+    Wraps another Storage and persists executions from a background thread.
+
+    save_execution only enqueues; the writer drains the bounded queue in batches
+    through the wrapped storage's save_executions, either when `batch_size`
+    executions are waiting or every `flush_interval` seconds. When the queue is
+    full, `overflow` decides whether the caller blocks (up to `put_timeout`
+    seconds, then drops), the new execution is dropped, or the oldest queued
+    one is. Executions still in the queue stay readable through load_execution.
+    """
+
+    def __init__(
+        self,
+        storage: Storage,
+        max_queue_size: int = 10000,
+        batch_size: int = 100,
+        flush_interval: float = 0.5,
+        overflow: str = "block",
+        put_timeout: Optional[float] = None,
+    ):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {OVERFLOW_POLICIES}, got {overflow!r}")
+
+        self.storage = storage
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.put_timeout = put_timeout
+        self.dropped = 0
+        self.failed = 0
+
+        self._queue: Deque["Execution"] = deque()
+        self._pending: Dict[str, "Execution"] = {}
+        self._in_flight = 0
+        self._flush_requested = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="xray-buffered-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def save_execution(self, execution: "Execution") -> None:
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("BufferedStorage is closed")
+            if len(self._queue) >= self.max_queue_size and not self._make_room():
+                self.dropped += 1
+                logger.debug("X-Ray writer queue full, dropping execution %s", execution.execution_id)
+                return
+            self._queue.append(execution)
+            self._pending[execution.execution_id] = execution
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify_all()
+
+    def save_executions(self, executions: Iterable["Execution"]) -> None:
+        for execution in executions:
+            self.save_execution(execution)
+
+    async def asave_execution(self, execution: "Execution") -> None:
+        if self.overflow == "block":
+            await super().asave_execution(execution)
+        else:
+            self.save_execution(execution)
+
+    def load_execution(self, execution_id: str) -> Optional["Execution"]:
+        with self._cond:
+            execution = self._pending.get(execution_id)
+        if execution is not None:
+            return execution
+        return self.storage.load_execution(execution_id)
+
+    def load_execution_view(self, execution_id: str) -> Optional["ExecutionView"]:
+        with self._cond:
+            execution = self._pending.get(execution_id)
+        if execution is not None:
+            return super().load_execution_view(execution_id)
+        return self.storage.load_execution_view(execution_id)
+
+    def list_executions(self, limit: int = 100, cursor: Optional[str] = None, **filters: Any) -> List["Execution"]:
+        return self.storage.list_executions(limit=limit, cursor=cursor, **filters)
+
+    def list_execution_summaries(self, limit: int = 100, cursor: Optional[str] = None, **filters: Any) -> List[Dict[str, Any]]:
+        return self.storage.list_execution_summaries(limit=limit, cursor=cursor, **filters)
+
+    def iter_execution_ids(self, batch_size: int = 100) -> Iterator[str]:
+        return self.storage.iter_execution_ids(batch_size)
+
+    def compact(self, policy: "RetentionPolicy", now: Optional[datetime] = None) -> Dict[str, int]:
+        self.flush()
+        return self.storage.compact(policy, now)
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until everything queued so far is written. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify_all()
+            while self._queue or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        self.storage.flush()
+        return True
+
+    def close(self) -> None:
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        atexit.unregister(self.close)
+        self.storage.close()
+
+    def _make_room(self) -> bool:
+        if self.overflow == "drop_newest":
+            return False
+        if self.overflow == "drop_oldest":
+            oldest = self._queue.popleft()
+            self._pending.pop(oldest.execution_id, None)
+            self.dropped += 1
+            logger.debug("X-Ray writer queue full, dropping execution %s", oldest.execution_id)
+            return True
+
+        deadline = None if self.put_timeout is None else time.monotonic() + self.put_timeout
+        while len(self._queue) >= self.max_queue_size and not self._closed:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            self._cond.wait(remaining)
+        return not self._closed
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                deadline = time.monotonic() + self.flush_interval
+                while not self._closed and not self._flush_requested and len(self._queue) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if not self._queue:
+                    self._flush_requested = False
+                    self._cond.notify_all()
+                    if self._closed:
+                        return
+                    continue
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                self._in_flight += len(batch)
+                if not self._queue:
+                    self._flush_requested = False
+
+            try:
+                self.storage.save_executions(batch)
+            except Exception:
+                self.failed += len(batch)
+                logger.exception("X-Ray writer failed to save %d executions", len(batch))
+
+            with self._cond:
+                for execution in batch:
+                    if self._pending.get(execution.execution_id) is execution:
+                        del self._pending[execution.execution_id]
+                self._in_flight -= len(batch)
+                self._cond.notify_all()
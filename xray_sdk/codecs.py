@@ -0,0 +1,172 @@
+import functools
+import gzip
+import json
+from typing import Any, List, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def json_dumps(value: Any) -> str:
+    """Compact JSON text; uses orjson when installed."""
+    if orjson is not None:
+        return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(value, separators=(",", ":"), default=str)
+
+
+def json_loads(data: Any) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class Codec:
+    name = ""
+    extension = ""
+
+    def encode(self, value: Any) -> bytes:
+        raise NotImplementedError
+
+    def decode(self, data: bytes) -> Any:
+        raise NotImplementedError
+
+
+class JSONCodec(Codec):
+    """Compact JSON. Also decodes the indented files older versions wrote."""
+
+    name = "json"
+    extension = ".json"
+
+    def encode(self, value: Any) -> bytes:
+        return json_dumps(value).encode()
+
+    def decode(self, data: bytes) -> Any:
+        return json_loads(data)
+
+
+class MsgpackCodec(Codec):
+    name = "msgpack"
+    extension = ".msgpack"
+
+    def __init__(self):
+        if msgpack is None:
+            raise ImportError("The msgpack codec requires the 'msgpack' package")
+
+    def encode(self, value: Any) -> bytes:
+        return msgpack.packb(value, default=str, use_bin_type=True)
+
+    def decode(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+class Compression:
+    name = ""
+    extension = ""
+    magic = b""
+
+    def compress(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+    def decompress(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+
+class GzipCompression(Compression):
+    name = "gzip"
+    extension = ".gz"
+    magic = b"\x1f\x8b"
+
+    def __init__(self, level: int = 6):
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return gzip.compress(data, compresslevel=self.level, mtime=0)
+
+    def decompress(self, data: bytes) -> bytes:
+        return gzip.decompress(data)
+
+
+class ZstdCompression(Compression):
+    name = "zstd"
+    extension = ".zst"
+    magic = b"\x28\xb5\x2f\xfd"
+
+    def __init__(self, level: int = 3):
+        if zstandard is None:
+            raise ImportError("zstd compression requires the 'zstandard' package")
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return zstandard.ZstdCompressor(level=self.level).compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zstandard.ZstdDecompressor().decompress(data)
+
+
+CODECS = {"json": JSONCodec, "msgpack": MsgpackCodec}
+COMPRESSIONS = {"gzip": GzipCompression, "zstd": ZstdCompression}
+
+# Every extension an execution file may have, whatever the storage was configured with.
+FILE_EXTENSIONS = [
+    codec.extension + compression
+    for codec in CODECS.values()
+    for compression in ("", *(c.extension for c in COMPRESSIONS.values()))
+]
+
+
+@functools.lru_cache(maxsize=None)
+def get_codec(name: str) -> Codec:
+    if name not in CODECS:
+        raise ValueError(f"codec must be one of {tuple(CODECS)}, got {name!r}")
+    return CODECS[name]()
+
+
+@functools.lru_cache(maxsize=None)
+def get_compression(name: Optional[str]) -> Optional[Compression]:
+    if name is None:
+        return None
+    if name not in COMPRESSIONS:
+        raise ValueError(f"compression must be one of {tuple(COMPRESSIONS)} or None, got {name!r}")
+    return COMPRESSIONS[name]()
+
+
+class Serializer:
+    """A codec plus optional compression. Decoding detects both from the data itself."""
+
+    def __init__(self, codec: str = "json", compression: Optional[str] = None):
+        self.codec = get_codec(codec)
+        self.compression = get_compression(compression)
+        self.extension = self.codec.extension + (self.compression.extension if self.compression else "")
+
+    @property
+    def extensions(self) -> List[str]:
+        """This serializer's file extension first, then every other readable one."""
+        return [self.extension] + [ext for ext in FILE_EXTENSIONS if ext != self.extension]
+
+    def encode(self, value: Any) -> bytes:
+        data = self.codec.encode(value)
+        if self.compression is not None:
+            data = self.compression.compress(data)
+        return data
+
+    def decode(self, data: bytes) -> Any:
+        for name, compression in COMPRESSIONS.items():
+            if data.startswith(compression.magic):
+                data = get_compression(name).decompress(data)
+                break
+        if data.lstrip()[:1] in (b"{", b"["):
+            return json_loads(data)
+        return get_codec("msgpack").decode(data)
+
@@ -1,11 +1,99 @@
+import functools
+import inspect
 import json
+import logging
+import random
+import threading
+import time
+import tracemalloc
 import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime
-from typing import Any, Dict, List, Optional, TYPE_CHECKING
-from dataclasses import dataclass, asdict, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, TYPE_CHECKING
+from dataclasses import dataclass, field, fields
 
 if TYPE_CHECKING:
+    from .events import EventBroker
+    from .metrics import MetricsAggregator
+    from .sampling import SamplingPolicy
     from .storage import Storage
+    from .views import ExecutionView
+
+
+logger = logging.getLogger(__name__)
+
+_current_execution: ContextVar[Optional[str]] = ContextVar("xray_current_execution", default=None)
+_current_step: ContextVar[Optional[tuple]] = ContextVar("xray_current_step", default=None)
+
+
+class _AllocationTracer:
+    """
+    Shares tracemalloc between concurrently sampled steps: tracing starts with
+    the first active step and stops after the last one, and only if it was
+    started here, so one step finishing never resets another's baseline.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._active = 0
+        self._started = False
+
+    def enter(self) -> int:
+        """Begin sampling a step; returns the current traced size to pass to exit()."""
+        with self._lock:
+            if self._active == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started = True
+            self._active += 1
+            return tracemalloc.get_traced_memory()[0]
+
+    def exit(self, memory_start: int) -> int:
+        """Net bytes allocated since enter() returned `memory_start`."""
+        with self._lock:
+            alloc_bytes = tracemalloc.get_traced_memory()[0] - memory_start
+            self._active -= 1
+            if self._active == 0 and self._started:
+                tracemalloc.stop()
+                self._started = False
+            return alloc_bytes
+
+
+_allocation_tracer = _AllocationTracer()
+
+
+def _new_step_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def entity_ref(entity_id: str, fields: Optional[List[str]] = None, **values: Any) -> Dict[str, Any]:
+    """
+    Reference to an entity registered with XRay.add_entities, stored in place of a
+    copy. Execution.to_dict() expands it to the entity (or just `fields` of it),
+    followed by `values`.
+    """
+    ref: Dict[str, Any] = {"$ref": entity_id}
+    if fields is not None:
+        ref["$pick"] = list(fields)
+    ref.update(values)
+    return ref
+
+
+def expand_entity_refs(value: Any, entities: Dict[str, Dict[str, Any]]) -> Any:
+    """Copy of `value` with every reference to one of `entities` expanded."""
+    if isinstance(value, dict):
+        entity = entities.get(value["$ref"]) if "$ref" in value else None
+        if entity is None:
+            return {key: expand_entity_refs(item, entities) for key, item in value.items()}
+        fields = value.get("$pick")
+        expanded = dict(entity) if fields is None else {key: entity.get(key) for key in fields}
+        for key, item in value.items():
+            if key not in ("$ref", "$pick"):
+                expanded[key] = expand_entity_refs(item, entities)
+        return expanded
+    if isinstance(value, list):
+        return [expand_entity_refs(item, entities) for item in value]
+    return value
 
 
 @dataclass
@@ -17,6 +105,16 @@ class Step:
     metadata: Dict[str, Any] = field(default_factory=dict)
     timestamp: str = field(default_factory=lambda: datetime.utcnow().isoformat())
     duration_ms: Optional[float] = None
+    step_id: Optional[str] = field(default_factory=_new_step_id)
+    parent_step_id: Optional[str] = None
+    ended_at: Optional[str] = None
+
+
+_STEP_FIELDS = [step_field.name for step_field in fields(Step)]
+
+
+def _step_dict(step: Step) -> Dict[str, Any]:
+    return {name: getattr(step, name) for name in _STEP_FIELDS}
 
 
 @dataclass
@@ -27,74 +125,506 @@ class Execution:
     started_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
     ended_at: Optional[str] = None
     metadata: Dict[str, Any] = field(default_factory=dict)
+    entities: Dict[str, Dict[str, Any]] = field(default_factory=dict)
     
-    def to_dict(self) -> Dict[str, Any]:
-        return {
+    def to_dict(self, expand_refs: bool = True) -> Dict[str, Any]:
+        """
+        With `expand_refs` (the default), entity references in steps are replaced by
+        the entities themselves. Without it, steps keep the references and the entity
+        table is included, which is the compact form storage backends write.
+        """
+        data = {
             "execution_id": self.execution_id,
             "name": self.name,
-            "steps": [asdict(step) for step in self.steps],
+            "steps": [_step_dict(step) for step in self.steps],
             "started_at": self.started_at,
             "ended_at": self.ended_at,
             "metadata": self.metadata,
         }
+        if not expand_refs:
+            data["entities"] = self.entities
+        elif self.entities:
+            data["steps"] = [self.expand_refs(step) for step in data["steps"]]
+        return data
+    
+    def expand_refs(self, value: Any) -> Any:
+        """Copy of `value` with every known entity reference expanded."""
+        return expand_entity_refs(value, self.entities)
+    
+    def summary(self) -> Dict[str, Any]:
+        top_level = [step for step in self.steps if step.parent_step_id is None]
+        durations = [step.duration_ms for step in top_level if step.duration_ms is not None]
+        return {
+            "execution_id": self.execution_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "ended_at": self.ended_at,
+            "step_count": len(self.steps),
+            "total_duration_ms": sum(durations) if durations else None,
+            "status": top_level[-1].outputs.get("status") if top_level else None,
+        }
+    
+    def critical_path(self) -> List[Step]:
+        """
+        Steps that bound the execution's latency: every top-level step, and below each
+        one the child that finished last, recursively.
+        """
+        children: Dict[Optional[str], List[Step]] = {}
+        for step in self.steps:
+            children.setdefault(step.parent_step_id, []).append(step)
+        
+        def end_key(step: Step) -> str:
+            return step.ended_at or step.timestamp or ""
+        
+        path = []
+        for step in children.get(None, []):
+            while step is not None:
+                path.append(step)
+                nested = children.get(step.step_id) if step.step_id else None
+                step = max(nested, key=end_key) if nested else None
+        return path
+
+
+class StepRecorder:
+    """Handle yielded by XRay.step(); fill in outputs, reasoning and metadata inside the block."""
+    
+    def __init__(self, name: str, inputs: Dict[str, Any], reasoning: Optional[str], metadata: Dict[str, Any]):
+        self.name = name
+        self.inputs = inputs
+        self.outputs: Dict[str, Any] = {}
+        self.reasoning = reasoning
+        self.metadata = metadata
+        self.discarded = False
+
+    def discard(self) -> None:
+        """Don't record this step, e.g. when whoever was waiting for it has given up."""
+        self.discarded = True
+
+
+class _ExecutionRegistry:
+    """
+    Lock-guarded map of in-flight executions. Executions untouched for longer
+    than `ttl_seconds` (end_execution never called) are evicted on a periodic
+    sweep so abandoned runs can't grow memory without bound.
+    """
+    
+    def __init__(self, ttl_seconds: Optional[float] = None):
+        self.ttl_seconds = ttl_seconds
+        self.evicted = 0
+        self._lock = threading.Lock()
+        self._executions: Dict[str, Execution] = {}
+        self._last_touched: Dict[str, float] = {}
+        self._next_sweep = time.monotonic() + (ttl_seconds or 0)
+    
+    def add(self, execution: Execution) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._executions[execution.execution_id] = execution
+            self._last_touched[execution.execution_id] = now
+            if self.ttl_seconds is not None and now >= self._next_sweep:
+                self._sweep(now)
+    
+    def get(self, execution_id: str) -> Optional[Execution]:
+        with self._lock:
+            return self._executions.get(execution_id)
+    
+    def pop(self, execution_id: str) -> Optional[Execution]:
+        with self._lock:
+            self._last_touched.pop(execution_id, None)
+            return self._executions.pop(execution_id, None)
+    
+    def append_step(self, execution_id: str, step: Step) -> bool:
+        with self._lock:
+            execution = self._executions.get(execution_id)
+            if execution is None:
+                return False
+            steps = execution.steps
+            position = len(steps)
+            while position and steps[position - 1].timestamp > step.timestamp:
+                position -= 1
+            steps.insert(position, step)
+            self._last_touched[execution_id] = time.monotonic()
+            return True
+    
+    def add_entities(self, execution_id: str, entities: Dict[str, Dict[str, Any]]) -> bool:
+        with self._lock:
+            execution = self._executions.get(execution_id)
+            if execution is None:
+                return False
+            execution.entities.update(entities)
+            self._last_touched[execution_id] = time.monotonic()
+            return True
+    
+    def __len__(self) -> int:
+        return len(self._executions)
+    
+    def _sweep(self, now: float) -> None:
+        expired = [eid for eid, touched in self._last_touched.items() if now - touched > self.ttl_seconds]
+        for execution_id in expired:
+            del self._executions[execution_id]
+            del self._last_touched[execution_id]
+        if expired:
+            self.evicted += len(expired)
+            logger.warning("Evicted %d abandoned X-Ray executions (no end_execution within %ss)", len(expired), self.ttl_seconds)
+        self._next_sweep = now + min(self.ttl_seconds, 60.0)
 
 
 class XRay:
-    def __init__(self, storage: Optional["Storage"] = None, storage_path: Optional[str] = None):
+    def __init__(
+        self,
+        storage: Optional["Storage"] = None,
+        storage_path: Optional[str] = None,
+        execution_ttl: Optional[float] = 3600.0,
+        sampling: Optional["SamplingPolicy"] = None,
+        metrics: Optional["MetricsAggregator"] = None,
+        events: Optional["EventBroker"] = None
+    ):
         if storage is None:
             from .storage import JSONFileStorage
             storage = JSONFileStorage(storage_path)
         self.storage = storage
-        self._active_executions: Dict[str, Execution] = {}
+        self.sampling = sampling
+        self.sampled_out = 0
+        if metrics is None:
+            from .metrics import MetricsAggregator
+            metrics = MetricsAggregator()
+        self.metrics_aggregator = metrics
+        self.events = events
+        self._active_executions = _ExecutionRegistry(ttl_seconds=execution_ttl)
+    
+    @staticmethod
+    def current_execution_id() -> Optional[str]:
+        return _current_execution.get()
     
     def start_execution(self, name: str, metadata: Optional[Dict[str, Any]] = None) -> str:
         execution_id = str(uuid.uuid4())
+        metadata = metadata or {}
+        if self.sampling is not None:
+            sampled, capture_level = self.sampling.head_sample(name)
+            metadata = {**metadata, "sampling": {"head_sampled": sampled, "capture_level": capture_level}}
         execution = Execution(
             execution_id=execution_id,
             name=name,
-            metadata=metadata or {}
+            metadata=metadata
         )
-        self._active_executions[execution_id] = execution
+        self._active_executions.add(execution)
+        if self.events is not None and self.events.has_subscribers:
+            self.events.publish({
+                "type": "execution_started",
+                "execution_id": execution_id,
+                "name": name,
+                "started_at": execution.started_at,
+                "metadata": execution.metadata,
+            })
         return execution_id
     
+    @contextmanager
+    def execution(self, name: str, metadata: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        """
+        Start an execution, make it the current one for this context, and end it on exit.
+        Steps recorded with execution_id=None inside the block attach to it; to record
+        from a worker thread, submit the work through contextvars.copy_context().run.
+        """
+        execution_id = self.start_execution(name, metadata)
+        token = _current_execution.set(execution_id)
+        try:
+            yield execution_id
+        finally:
+            _current_execution.reset(token)
+            self.end_execution(execution_id)
+    
     def add_step(
         self,
-        execution_id: str,
+        execution_id: Optional[str],
         step_name: str,
         inputs: Dict[str, Any],
         outputs: Dict[str, Any],
         reasoning: Optional[str] = None,
         metadata: Optional[Dict[str, Any]] = None,
-        duration_ms: Optional[float] = None
-    ) -> None:
-        if execution_id not in self._active_executions:
-            raise ValueError(f"Execution {execution_id} not found. Did you call start_execution?")
-        
+        duration_ms: Optional[float] = None,
+        timestamp: Optional[str] = None,
+        parent_step_id: Optional[str] = None,
+        step_id: Optional[str] = None,
+        ended_at: Optional[str] = None
+    ) -> str:
+        """
+        Append a step and return its step_id. Steps recorded inside an XRay.step() block
+        of the same execution become its children unless parent_step_id is given.
+        """
+        execution_id = self._resolve_execution_id(execution_id)
+        if parent_step_id is None:
+            current_step = _current_step.get()
+            if current_step is not None and current_step[0] == execution_id:
+                parent_step_id = current_step[1]
+        if self.sampling is not None:
+            capture_level = self._capture_level(execution_id)
+            if capture_level != "full":
+                inputs, outputs, metadata = self.sampling.capture(capture_level, inputs, outputs, metadata or {})
         step = Step(
             name=step_name,
             inputs=inputs,
             outputs=outputs,
             reasoning=reasoning,
             metadata=metadata or {},
-            duration_ms=duration_ms
+            duration_ms=duration_ms,
+            parent_step_id=parent_step_id,
+            ended_at=ended_at
         )
+        if timestamp is not None:
+            step.timestamp = timestamp
+        if step_id is not None:
+            step.step_id = step_id
         
-        self._active_executions[execution_id].steps.append(step)
+        if not self._active_executions.append_step(execution_id, step):
+            raise ValueError(f"Execution {execution_id} not found. Did you call start_execution?")
+        if self.events is not None and self.events.has_subscribers:
+            execution = self._active_executions.get(execution_id)
+            step_data = _step_dict(step)
+            if execution is not None and execution.entities:
+                step_data = execution.expand_refs(step_data)
+            self.events.publish({"type": "step", "execution_id": execution_id, "step": step_data})
+        return step.step_id
     
-    def end_execution(self, execution_id: str) -> None:
-        if execution_id not in self._active_executions:
-            raise ValueError(f"Execution {execution_id} not found")
+    def add_entities(self, entities: Dict[str, Dict[str, Any]], execution_id: Optional[str] = None) -> None:
+        """
+        Register entities (e.g. candidates keyed by id) once per execution, so steps can
+        store entity_ref(id) instead of repeating the full objects.
+        """
+        execution_id = self._resolve_execution_id(execution_id)
+        if self.sampling is not None and self._capture_level(execution_id) == "summary":
+            return
+        if not self._active_executions.add_entities(execution_id, entities):
+            raise ValueError(f"Execution {execution_id} not found. Did you call start_execution?")
+    
+    @contextmanager
+    def step(
+        self,
+        name: str,
+        inputs: Optional[Dict[str, Any]] = None,
+        execution_id: Optional[str] = None,
+        reasoning: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        cpu_time: bool = False,
+        memory_sample_rate: float = 0.0
+    ) -> Iterator[StepRecorder]:
+        """
+        Record the enclosed block as a step. Duration comes from perf_counter_ns, so it
+        is unaffected by wall-clock adjustments. With `cpu_time` the thread CPU time is
+        stored under metadata["profile"]; `memory_sample_rate` is the fraction of calls
+        whose net tracemalloc allocation delta is stored there as well (process-wide, so
+        it includes other threads' allocations during the step). An exception is
+        recorded as outputs["status"] = "error" plus metadata["error"], then re-raised.
         
-        execution = self._active_executions[execution_id]
-        execution.ended_at = datetime.utcnow().isoformat()
-        self.storage.save_execution(execution)
-        del self._active_executions[execution_id]
+        Steps opened inside the block (including from tasks or threads running in a
+        copy of this context) are recorded as children, so parallel fan-out shows up
+        as overlapping sub-steps.
+        """
+        execution_id = self._resolve_execution_id(execution_id)
+        recorder = StepRecorder(name, inputs if inputs is not None else {}, reasoning, dict(metadata or {}))
+        step_id = _new_step_id()
+        parent = _current_step.get()
+        parent_step_id = parent[1] if parent is not None and parent[0] == execution_id else None
+        step_token = _current_step.set((execution_id, step_id))
+        execution_token = _current_execution.set(execution_id)
+        timestamp = datetime.utcnow().isoformat()
+        
+        memory_start = None
+        if memory_sample_rate and random.random() < memory_sample_rate:
+            memory_start = _allocation_tracer.enter()
+        cpu_start = time.thread_time_ns() if cpu_time else None
+        start = time.perf_counter_ns()
+        try:
+            yield recorder
+        except BaseException as e:
+            recorder.outputs.setdefault("status", "error")
+            recorder.metadata["error"] = {"type": type(e).__name__, "message": str(e)}
+            raise
+        finally:
+            duration_ns = time.perf_counter_ns() - start
+            ended_at = datetime.utcnow().isoformat()
+            _current_execution.reset(execution_token)
+            _current_step.reset(step_token)
+            profile = {}
+            if cpu_start is not None:
+                profile["cpu_time_ms"] = (time.thread_time_ns() - cpu_start) / 1e6
+            if memory_start is not None:
+                profile["alloc_bytes"] = _allocation_tracer.exit(memory_start)
+            if profile:
+                recorder.metadata["profile"] = profile
+            if not recorder.discarded:
+                self.add_step(
+                    execution_id, recorder.name,
+                    inputs=recorder.inputs,
+                    outputs=recorder.outputs,
+                    reasoning=recorder.reasoning,
+                    metadata=recorder.metadata,
+                    duration_ms=duration_ns / 1e6,
+                    timestamp=timestamp,
+                    parent_step_id=parent_step_id,
+                    step_id=step_id,
+                    ended_at=ended_at
+                )
+    
+    def traced_step(
+        self,
+        name: Optional[str] = None,
+        capture_args: bool = True,
+        capture_result: bool = True,
+        cpu_time: bool = False,
+        memory_sample_rate: float = 0.0
+    ) -> Callable[[Callable], Callable]:
+        """
+        Decorator recording each call as a step of the current execution, with bound
+        arguments as inputs and the return value as outputs["result"]. Calls made
+        outside any execution run untraced.
+        """
+        def decorator(func: Callable) -> Callable:
+            step_name = name or func.__name__
+            signature = inspect.signature(func)
+            
+            def step_kwargs(args: tuple, kwargs: dict) -> Dict[str, Any]:
+                inputs = dict(signature.bind_partial(*args, **kwargs).arguments) if capture_args else {}
+                return {"inputs": inputs, "cpu_time": cpu_time, "memory_sample_rate": memory_sample_rate}
+            
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    if _current_execution.get() is None:
+                        return await func(*args, **kwargs)
+                    with self.step(step_name, **step_kwargs(args, kwargs)) as step:
+                        result = await func(*args, **kwargs)
+                        if capture_result:
+                            step.outputs["result"] = result
+                        return result
+                return async_wrapper
+            
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if _current_execution.get() is None:
+                    return func(*args, **kwargs)
+                with self.step(step_name, **step_kwargs(args, kwargs)) as step:
+                    result = func(*args, **kwargs)
+                    if capture_result:
+                        step.outputs["result"] = result
+                    return result
+            return wrapper
+        return decorator
+    
+    def end_execution(self, execution_id: str) -> None:
+        execution = self._finish_execution(execution_id)
+        if self._retain(execution):
+            self.storage.save_execution(execution)
+    
+    def end_executions(self, execution_ids: List[str]) -> None:
+        """End several executions and persist them with a single save_executions call."""
+        finished = []
+        missing = []
+        for execution_id in execution_ids:
+            try:
+                execution = self._finish_execution(execution_id)
+            except ValueError:
+                missing.append(execution_id)
+                continue
+            if self._retain(execution):
+                finished.append(execution)
+        if finished:
+            self.storage.save_executions(finished)
+        if missing:
+            raise ValueError(f"Executions not found: {', '.join(missing)}")
+    
+    def ingest_executions(self, executions: List[Execution]) -> None:
+        """
+        Persist executions ended by another process, e.g. batches a collector received
+        from HTTPStorage. They were already sampled there; here they are only counted
+        in metrics, announced to event subscribers and saved.
+        """
+        for execution in executions:
+            self.metrics_aggregator.record(execution)
+            self._publish_ended(execution, True)
+        self.storage.save_executions(executions)
     
     def get_execution(self, execution_id: str) -> Optional[Execution]:
-        if execution_id in self._active_executions:
-            return self._active_executions[execution_id]
+        execution = self._active_executions.get(execution_id)
+        if execution is not None:
+            return execution
         return self.storage.load_execution(execution_id)
     
-    def list_executions(self, limit: int = 100) -> List[Execution]:
-        return self.storage.list_executions(limit=limit)
-
+    def get_execution_view(self, execution_id: str) -> Optional["ExecutionView"]:
+        """Like get_execution, but step payloads of stored executions are parsed only when read."""
+        from .views import ExecutionView
+        
+        execution = self._active_executions.get(execution_id)
+        if execution is not None:
+            return ExecutionView.from_execution(execution)
+        return self.storage.load_execution_view(execution_id)
+    
+    def _resolve_execution_id(self, execution_id: Optional[str]) -> str:
+        if execution_id is not None:
+            return execution_id
+        current = _current_execution.get()
+        if current is None:
+            raise ValueError("No execution_id given and no current execution. Use xray.execution(...) or pass an id.")
+        return current
+    
+    def _finish_execution(self, execution_id: str) -> Execution:
+        execution = self._active_executions.pop(execution_id)
+        if execution is None:
+            raise ValueError(f"Execution {execution_id} not found")
+        execution.ended_at = datetime.utcnow().isoformat()
+        self.metrics_aggregator.record(execution)
+        return execution
+    
+    def capture_level(self, execution_id: Optional[str] = None) -> str:
+        """
+        How much of each step the execution keeps ("summary", "standard" or "full",
+        see SamplingPolicy), so callers can skip building payloads that a
+        "summary" capture would drop anyway.
+        """
+        return self._capture_level(self._resolve_execution_id(execution_id))
+    
+    def _capture_level(self, execution_id: str) -> str:
+        execution = self._active_executions.get(execution_id)
+        if execution is None:
+            return "full"
+        return execution.metadata.get("sampling", {}).get("capture_level", "full")
+    
+    def _retain(self, execution: Execution) -> bool:
+        retained = True
+        if self.sampling is not None:
+            reason = self.sampling.retention_reason(execution)
+            if reason is None:
+                self.sampled_out += 1
+                retained = False
+            elif "sampling" in execution.metadata:
+                execution.metadata["sampling"]["kept_by"] = reason
+        self._publish_ended(execution, retained)
+        return retained
+    
+    def _publish_ended(self, execution: Execution, retained: bool) -> None:
+        if self.events is not None and self.events.has_subscribers:
+            self.events.publish({
+                "type": "execution_ended",
+                "execution_id": execution.execution_id,
+                "retained": retained,
+                "summary": execution.summary(),
+            })
+    
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Per execution name and per step name: counts, status distributions and
+        duration_ms quantiles (p50/p95/p99), plus summed failed_by_filter and
+        rejection_summary counts, for executions ended through this instance.
+        """
+        return self.metrics_aggregator.snapshot()
+    
+    def list_executions(self, limit: int = 100, cursor: Optional[str] = None, **filters: Any) -> List[Execution]:
+        return self.storage.list_executions(limit=limit, cursor=cursor, **filters)
+    
+    def list_execution_summaries(self, limit: int = 100, cursor: Optional[str] = None, **filters: Any) -> List[Dict[str, Any]]:
+        return self.storage.list_execution_summaries(limit=limit, cursor=cursor, **filters)
+    
+    def flush(self) -> None:
+        self.storage.flush()
+    
+    def close(self) -> None:
+        self.storage.close()
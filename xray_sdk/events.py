@@ -0,0 +1,129 @@
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+
+class Subscription:
+    """
+    Bounded event queue for one subscriber. Readable from threads with get() or
+    from a coroutine with aget() when created with the consumer's event loop.
+    Once `dropped` is set (the queue overflowed) or the subscription is closed,
+    reads return None after the queued events.
+    """
+
+    def __init__(
+        self,
+        broker: "EventBroker",
+        max_queue_size: int,
+        execution_id: Optional[str] = None,
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+    ):
+        self.execution_id = execution_id
+        self.max_queue_size = max_queue_size
+        self.dropped = False
+        self.closed = False
+        self._broker = broker
+        self._events: Deque[Dict[str, Any]] = deque()
+        self._cond = threading.Condition()
+        self._loop = loop
+        self._wakeup = asyncio.Event() if loop is not None else None
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Next event, or None once closed or dropped. Raises TimeoutError after `timeout` seconds."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._events or self.closed, timeout):
+                raise TimeoutError
+            return self._events.popleft() if self._events else None
+
+    async def aget(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Async get(); requires the subscription to have been created with a loop."""
+        while True:
+            with self._cond:
+                if self._events:
+                    return self._events.popleft()
+                if self.closed:
+                    return None
+                self._wakeup.clear()
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+
+    def close(self) -> None:
+        self._broker._unsubscribe(self)
+        self._close()
+
+    def _offer(self, event: Dict[str, Any]) -> bool:
+        with self._cond:
+            if self.closed:
+                return False
+            if len(self._events) >= self.max_queue_size:
+                self.dropped = True
+                self.closed = True
+            else:
+                self._events.append(event)
+            self._cond.notify_all()
+        self._wake()
+        return not self.dropped
+
+    def _close(self) -> None:
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+        self._wake()
+
+    def _wake(self) -> None:
+        if self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._wakeup.set)
+            except RuntimeError:
+                self.closed = True
+
+
+class EventBroker:
+    """
+    In-process publish/subscribe for live execution updates. publish() never
+    blocks: each subscriber has a bounded queue, and a subscriber that falls
+    more than `max_queue_size` events behind is dropped instead of slowing the
+    pipeline down.
+    """
+
+    def __init__(self, max_queue_size: int = 1000):
+        self.max_queue_size = max_queue_size
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._subscriptions: List[Subscription] = []
+
+    @property
+    def has_subscribers(self) -> bool:
+        return bool(self._subscriptions)
+
+    def subscribe(
+        self, execution_id: Optional[str] = None, loop: Optional[asyncio.AbstractEventLoop] = None
+    ) -> Subscription:
+        """Subscribe to every event, or only those of `execution_id`."""
+        subscription = Subscription(self, self.max_queue_size, execution_id, loop)
+        with self._lock:
+            self._subscriptions = [*self._subscriptions, subscription]
+        return subscription
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        overflowed = []
+        for subscription in self._subscriptions:
+            if subscription.execution_id is not None and subscription.execution_id != event.get("execution_id"):
+                continue
+            if not subscription._offer(event) and subscription.dropped:
+                overflowed.append(subscription)
+        if overflowed:
+            with self._lock:
+                remaining = [s for s in self._subscriptions if s not in overflowed]
+                self.dropped += len(self._subscriptions) - len(remaining)
+                self._subscriptions = remaining
+
+    def close(self) -> None:
+        with self._lock:
+            subscriptions, self._subscriptions = self._subscriptions, []
+        for subscription in subscriptions:
+            subscription._close()
+
+    def _unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscriptions = [s for s in self._subscriptions if s is not subscription]
@@ -0,0 +1,191 @@
+import gzip
+import logging
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, TYPE_CHECKING
+
+from .codecs import json_dumps, json_loads
+from .storage import Storage, _atomic_write, execution_from_dict
+
+if TYPE_CHECKING:
+    from .core import Execution
+
+
+logger = logging.getLogger(__name__)
+
+# Statuses worth retrying; any other 4xx means the batch itself was rejected.
+RETRYABLE_STATUSES = (408, 429, 500, 502, 503, 504)
+
+# Spooled batch names: time-ordered, plus how many drains the collector has already failed them.
+_SPOOL_NAME = re.compile(r"^(batch-\d+-[0-9a-f]+)(?:\.(\d+))?\.json\.gz$")
+
+
+class HTTPStorage(Storage):
+    """
+    Ships executions to an X-Ray collector (the backend's POST /api/ingest)
+    instead of writing them locally, so traced services don't need access to
+    the dashboard's storage directory.
+
+    Each save_executions call is one gzip-compressed request; wrap this in
+    BufferedStorage to batch from a background thread. Failed requests are
+    retried `max_retries` times with exponential backoff. Batches that still
+    can't be delivered are spooled under `spool_path` and re-sent, one attempt
+    each, after the next successful request or on flush(). A spooled batch the
+    collector fails `max_spool_attempts` times (e.g. one that makes it return
+    500) is moved to `spool_path/dead` instead. Reads go to the collector's API.
+    """
+
+    def __init__(
+        self,
+        url: str = "http://localhost:8000",
+        spool_path: Optional[str] = None,
+        timeout: float = 10.0,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+        max_spool_bytes: int = 256 * 1024 * 1024,
+        max_spool_attempts: int = 5,
+        headers: Optional[Dict[str, str]] = None,
+    ):
+        if spool_path is None:
+            spool_path = "./xray_storage/spool"
+
+        self.url = url.rstrip("/")
+        self.spool_path = Path(spool_path)
+        self.spool_path.mkdir(parents=True, exist_ok=True)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_spool_bytes = max_spool_bytes
+        self.max_spool_attempts = max_spool_attempts
+        self.headers = dict(headers or {})
+        self.spooled = 0
+        self.dropped = 0
+        self.dead_lettered = 0
+        self._spool_lock = threading.Lock()
+
+    def save_execution(self, execution: "Execution") -> None:
+        self.save_executions([execution])
+
+    def save_executions(self, executions: Iterable["Execution"]) -> None:
+        payload = [execution.to_dict(expand_refs=False) for execution in executions]
+        if not payload:
+            return
+        body = gzip.compress(json_dumps({"executions": payload}).encode(), compresslevel=6, mtime=0)
+        if self._send(body):
+            self._drain_spool()
+        else:
+            self._spool(body, len(payload))
+
+    def load_execution(self, execution_id: str) -> Optional["Execution"]:
+        try:
+            data = self._get(f"/api/executions/{urllib.parse.quote(execution_id, safe='')}")
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return None
+            raise
+        return execution_from_dict(data)
+
+    def list_executions(self, limit: int = 100, cursor: Optional[str] = None, **filters: Any) -> List["Execution"]:
+        return [execution_from_dict(data) for data in self._get("/api/executions", limit=limit, cursor=cursor, **filters)]
+
+    def list_execution_summaries(self, limit: int = 100, cursor: Optional[str] = None, **filters: Any) -> List[Dict[str, Any]]:
+        return self._get("/api/executions/summary", limit=limit, cursor=cursor, **filters)
+
+    def flush(self) -> None:
+        """Try to deliver spooled batches now."""
+        self._drain_spool()
+
+    def _get(self, path: str, **params: Any) -> Any:
+        query = urllib.parse.urlencode({key: value for key, value in params.items() if value is not None})
+        request = urllib.request.Request(f"{self.url}{path}?{query}" if query else f"{self.url}{path}", headers=self.headers)
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json_loads(response.read())
+
+    def _send(self, body: bytes) -> bool:
+        """POST one batch. Returns False if the collector stayed unreachable; raises if it rejected the batch."""
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(self.backoff * 2 ** (attempt - 1) * (0.5 + random.random()))
+            if self._post(body) == "ok":
+                return True
+        return False
+
+    def _post(self, body: bytes) -> str:
+        """
+        One POST: "ok", "failed" if the collector answered with a retryable
+        status, or "unreachable". Raises ValueError if it rejected the batch.
+        """
+        request = urllib.request.Request(
+            f"{self.url}/api/ingest",
+            data=body,
+            method="POST",
+            headers={**self.headers, "Content-Type": "application/json", "Content-Encoding": "gzip"},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+            return "ok"
+        except urllib.error.HTTPError as e:
+            if e.code not in RETRYABLE_STATUSES:
+                raise ValueError(f"X-Ray collector rejected batch: HTTP {e.code} {e.read()[:200]!r}") from e
+            logger.debug("X-Ray collector returned HTTP %d", e.code)
+            return "failed"
+        except (urllib.error.URLError, OSError) as e:
+            logger.debug("X-Ray collector unreachable: %s", e)
+            return "unreachable"
+
+    def _spool(self, body: bytes, count: int) -> None:
+        with self._spool_lock:
+            spooled_bytes = sum(path.stat().st_size for path in self.spool_path.glob("batch-*.json.gz"))
+            if spooled_bytes + len(body) > self.max_spool_bytes:
+                self.dropped += count
+                logger.warning("X-Ray spool full, dropping %d executions", count)
+                return
+            # Time-ordered names, so batches are re-sent oldest first.
+            _atomic_write(self.spool_path / f"batch-{time.time_ns():020d}-{uuid.uuid4().hex[:8]}.json.gz", body)
+            self.spooled += count
+        logger.warning("X-Ray collector unreachable, spooled %d executions to %s", count, self.spool_path)
+
+    def _drain_spool(self) -> None:
+        if not self._spool_lock.acquire(blocking=False):
+            return
+        try:
+            for path in sorted(self.spool_path.glob("batch-*.json.gz")):
+                match = _SPOOL_NAME.match(path.name)
+                if match is None:
+                    continue
+                try:
+                    body = path.read_bytes()
+                except FileNotFoundError:
+                    continue
+                try:
+                    result = self._post(body)
+                except ValueError:
+                    logger.exception("X-Ray collector rejected spooled batch %s, discarding it", path.name)
+                    path.unlink(missing_ok=True)
+                    continue
+                if result == "ok":
+                    path.unlink(missing_ok=True)
+                elif result == "unreachable":
+                    return
+                else:
+                    self._record_failure(path, match.group(1), int(match.group(2) or 0) + 1)
+        finally:
+            self._spool_lock.release()
+
+    def _record_failure(self, path: Path, stem: str, attempts: int) -> None:
+        if attempts < self.max_spool_attempts:
+            path.replace(path.with_name(f"{stem}.{attempts}.json.gz"))
+            return
+        dead_path = self.spool_path / "dead"
+        dead_path.mkdir(exist_ok=True)
+        path.replace(dead_path / path.name)
+        self.dead_lettered += 1
+        logger.error("X-Ray collector failed spooled batch %s %d times, moved it to %s", path.name, attempts, dead_path)
@@ -0,0 +1,313 @@
+import logging
+import math
+import os
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, TYPE_CHECKING
+
+from .codecs import json_dumps, json_loads
+from .storage import _atomic_write, _file_lock
+
+if TYPE_CHECKING:
+    from .core import Execution
+
+
+logger = logging.getLogger(__name__)
+
+# Step metadata keys holding {label: count} dicts that are summed across executions.
+DEFAULT_COUNTER_FIELDS = ("failed_by_filter", "rejection_summary")
+
+
+class QuantileSketch:
+    """
+    DDSketch-style quantile sketch. Positive values go into logarithmically spaced
+    buckets, so any quantile is within `relative_accuracy` of the true value while
+    memory stays bounded by `max_buckets` (the lowest buckets are merged first).
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048):
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if value <= 0:
+            self.zero_count += 1
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+        if len(self.buckets) > self.max_buckets:
+            lowest, second = sorted(self.buckets)[:2]
+            self.buckets[second] += self.buckets.pop(lowest)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return max(self.min, 0.0)
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                estimate = 2 * self._gamma ** key / (self._gamma + 1)
+                return min(max(estimate, self.min), self.max)
+        return self.max
+
+    def merge(self, other: "QuantileSketch") -> None:
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        while len(self.buckets) > self.max_buckets:
+            lowest, second = sorted(self.buckets)[:2]
+            self.buckets[second] += self.buckets.pop(lowest)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        if not self.count:
+            return {"count": 0, "mean": None, "min": None, "p50": None, "p95": None, "p99": None, "max": None}
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count,
+            "min": self.min,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "max": self.max,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "max_buckets": self.max_buckets,
+            "buckets": [[key, count] for key, count in self.buckets.items()],
+            "zero_count": self.zero_count,
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "QuantileSketch":
+        sketch = cls(data["relative_accuracy"], data["max_buckets"])
+        sketch.buckets = {key: count for key, count in data["buckets"]}
+        sketch.zero_count = data["zero_count"]
+        sketch.count = data["count"]
+        sketch.sum = data["sum"]
+        if sketch.count:
+            sketch.min = data["min"]
+            sketch.max = data["max"]
+        return sketch
+
+
+class _Series:
+    """Count, status distribution, duration sketch and summed counters for one name."""
+
+    def __init__(self):
+        self.count = 0
+        self.statuses: Counter = Counter()
+        self.duration_ms = QuantileSketch()
+        self.counters: Dict[str, Counter] = {}
+
+    def record(self, status: Optional[str], duration_ms: Optional[float]) -> None:
+        self.count += 1
+        self.statuses[status if status is not None else "unknown"] += 1
+        if duration_ms is not None:
+            self.duration_ms.add(duration_ms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        snapshot = {
+            "count": self.count,
+            "statuses": dict(self.statuses),
+            "duration_ms": self.duration_ms.summary(),
+        }
+        if self.counters:
+            snapshot["counters"] = {field: dict(counts) for field, counts in self.counters.items()}
+        return snapshot
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "statuses": dict(self.statuses),
+            "duration_ms": self.duration_ms.to_dict(),
+            "counters": {field: dict(counts) for field, counts in self.counters.items()},
+        }
+
+    def merge(self, other: "_Series") -> None:
+        self.count += other.count
+        self.statuses.update(other.statuses)
+        self.duration_ms.merge(other.duration_ms)
+        for field, counts in other.counters.items():
+            self.counters.setdefault(field, Counter()).update(counts)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "_Series":
+        series = cls()
+        series.count = data["count"]
+        series.statuses = Counter(data["statuses"])
+        series.duration_ms = QuantileSketch.from_dict(data["duration_ms"])
+        series.counters = {field: Counter(counts) for field, counts in data.get("counters", {}).items()}
+        return series
+
+
+class MetricsAggregator:
+    """
+    Running metrics over finished executions, updated once per execution so reading
+    them costs the same however much history is stored: per execution name and per
+    step name, a count, a status distribution and duration quantiles, plus per-step
+    sums of the {label: count} dicts found under `counter_fields` in step metadata.
+    """
+
+    def __init__(self, counter_fields: Iterable[str] = DEFAULT_COUNTER_FIELDS):
+        self.counter_fields = tuple(counter_fields)
+        self._lock = threading.Lock()
+        self._executions: Dict[str, _Series] = {}
+        self._steps: Dict[str, _Series] = {}
+
+    def record(self, execution: "Execution") -> None:
+        summary = execution.summary()
+        with self._lock:
+            series = self._executions.get(execution.name)
+            if series is None:
+                series = self._executions[execution.name] = _Series()
+            series.record(summary["status"], summary["total_duration_ms"])
+
+            for step in execution.steps:
+                series = self._steps.get(step.name)
+                if series is None:
+                    series = self._steps[step.name] = _Series()
+                series.record(step.outputs.get("status"), step.duration_ms)
+                for field in self.counter_fields:
+                    counts = step.metadata.get(field)
+                    if isinstance(counts, dict):
+                        counter = series.counters.setdefault(field, Counter())
+                        for label, count in counts.items():
+                            if isinstance(count, (int, float)):
+                                counter[label] += count
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "executions": {name: series.snapshot() for name, series in self._executions.items()},
+                "steps": {name: series.snapshot() for name, series in self._steps.items()},
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._executions.clear()
+            self._steps.clear()
+
+    def merge(self, other: "MetricsAggregator") -> None:
+        """Add another aggregator's metrics, e.g. one kept by another process."""
+        other_state = other.to_dict()
+        with self._lock:
+            for mine, theirs in ((self._executions, other_state["executions"]), (self._steps, other_state["steps"])):
+                for name, series in theirs.items():
+                    mine.setdefault(name, _Series()).merge(_Series.from_dict(series))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Full state, for persisting across restarts with from_dict()."""
+        with self._lock:
+            return {
+                "counter_fields": list(self.counter_fields),
+                "executions": {name: series.to_dict() for name, series in self._executions.items()},
+                "steps": {name: series.to_dict() for name, series in self._steps.items()},
+            }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MetricsAggregator":
+        aggregator = cls(data.get("counter_fields", DEFAULT_COUNTER_FIELDS))
+        aggregator._executions = {name: _Series.from_dict(series) for name, series in data["executions"].items()}
+        aggregator._steps = {name: _Series.from_dict(series) for name, series in data["steps"].items()}
+        return aggregator
+
+
+class MetricsSnapshots:
+    """
+    Per-process MetricsAggregator snapshots in one directory, for servers that
+    run several worker processes: each saves its own `<pid>.json`, and merged()
+    adds up every other process's latest snapshot. Snapshots left by processes
+    that have exited are folded into `base.json` by collect(), so they are
+    counted exactly once across restarts.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.lock_path = self.directory / ".lock"
+        self.pid = os.getpid()
+
+    def save(self, aggregator: MetricsAggregator) -> None:
+        """Atomically replace this process's snapshot."""
+        _atomic_write(self.directory / f"{self.pid}.json", json_dumps(aggregator.to_dict()))
+
+    def collect(self) -> None:
+        """Fold snapshots of exited processes into base.json and delete them."""
+        with _file_lock(self.lock_path):
+            dead = [path for path in self._process_snapshots() if not _process_alive(int(path.stem))]
+            if not dead:
+                return
+            base = self._load(self.directory / "base.json") or MetricsAggregator()
+            for path in dead:
+                snapshot = self._load(path)
+                if snapshot is not None:
+                    base.merge(snapshot)
+            _atomic_write(self.directory / "base.json", json_dumps(base.to_dict()))
+            for path in dead:
+                path.unlink(missing_ok=True)
+
+    def merged(self, live: Optional[MetricsAggregator] = None) -> MetricsAggregator:
+        """base.json plus every other process's snapshot, plus `live` in place of this process's own."""
+        result = MetricsAggregator(live.counter_fields if live is not None else DEFAULT_COUNTER_FIELDS)
+        paths = [self.directory / "base.json", *self._process_snapshots()]
+        for path in paths:
+            if live is not None and path.stem == str(self.pid):
+                continue
+            snapshot = self._load(path)
+            if snapshot is not None:
+                result.merge(snapshot)
+        if live is not None:
+            result.merge(live)
+        return result
+
+    def _process_snapshots(self) -> List[Path]:
+        return [path for path in self.directory.glob("*.json") if path.stem.isdigit()]
+
+    @staticmethod
+    def _load(path: Path) -> Optional[MetricsAggregator]:
+        try:
+            return MetricsAggregator.from_dict(json_loads(path.read_bytes()))
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError):
+            logger.warning("Ignoring unreadable metrics snapshot %s", path)
+            return None
+
+
+def _process_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # e.g. PermissionError: the process exists but belongs to someone else.
+        return True
+    return True
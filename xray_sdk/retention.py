@@ -0,0 +1,134 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .storage import Storage
+
+
+logger = logging.getLogger(__name__)
+
+
+class RetentionPolicy:
+    """
+    Bounds what a storage backend keeps; applied by Storage.compact().
+
+    - `max_age_seconds`: older executions are deleted, summary included.
+    - `downsample_after_seconds`: older executions keep only their summary, so
+      dashboards and metrics over long periods still see them.
+    - `max_count` / `max_bytes`: only the newest executions within these limits
+      are kept; payload bytes of downsampled executions don't count.
+
+    `per_name` holds policies for specific execution names; this policy covers
+    every other name, counted together.
+    """
+
+    def __init__(
+        self,
+        max_age_seconds: Optional[float] = None,
+        max_count: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        downsample_after_seconds: Optional[float] = None,
+        per_name: Optional[Dict[str, "RetentionPolicy"]] = None,
+    ):
+        self.max_age_seconds = max_age_seconds
+        self.max_count = max_count
+        self.max_bytes = max_bytes
+        self.downsample_after_seconds = downsample_after_seconds
+        self.per_name = dict(per_name or {})
+
+
+def plan_retention(
+    entries: Iterable[Dict[str, Any]], policy: RetentionPolicy, now: Optional[datetime] = None
+) -> Tuple[Set[str], Set[str]]:
+    """
+    Decide which executions to delete and which to downsample. Each entry needs
+    execution_id, name and started_at, plus "bytes" (payload size) and
+    "downsampled" when known. Returns (delete_ids, downsample_ids).
+    """
+    now = now or datetime.utcnow()
+    groups: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    for entry in entries:
+        key = entry.get("name") if entry.get("name") in policy.per_name else None
+        groups.setdefault(key, []).append(entry)
+
+    delete: Set[str] = set()
+    downsample: Set[str] = set()
+    for key, group in groups.items():
+        group_policy = policy.per_name[key] if key is not None else policy
+        expire_before = _cutoff(now, group_policy.max_age_seconds)
+        downsample_before = _cutoff(now, group_policy.downsample_after_seconds)
+        group.sort(key=lambda entry: (entry.get("started_at", ""), entry["execution_id"]), reverse=True)
+
+        kept = 0
+        kept_bytes = 0
+        for entry in group:
+            started_at = entry.get("started_at", "")
+            execution_id = entry["execution_id"]
+            size = 0 if entry.get("downsampled") else entry.get("bytes", 0)
+            if (
+                (expire_before is not None and started_at < expire_before)
+                or (group_policy.max_count is not None and kept >= group_policy.max_count)
+                or (group_policy.max_bytes is not None and kept_bytes + size > group_policy.max_bytes)
+            ):
+                delete.add(execution_id)
+                continue
+            if downsample_before is not None and started_at < downsample_before and not entry.get("downsampled"):
+                downsample.add(execution_id)
+                size = 0
+            kept += 1
+            kept_bytes += size
+    return delete, downsample
+
+
+def _cutoff(now: datetime, seconds: Optional[float]) -> Optional[str]:
+    return (now - timedelta(seconds=seconds)).isoformat() if seconds is not None else None
+
+
+class RetentionCompactor:
+    """
+    Runs storage.compact(policy) every `interval` seconds on a daemon thread.
+    `on_compact` gets each result, e.g. to drop caches of executions it removed.
+    """
+
+    def __init__(
+        self,
+        storage: "Storage",
+        policy: RetentionPolicy,
+        interval: float = 3600.0,
+        on_compact: Optional[Callable[[Dict[str, int]], None]] = None,
+    ):
+        self.storage = storage
+        self.policy = policy
+        self.interval = interval
+        self.on_compact = on_compact
+        self.last_result: Optional[Dict[str, int]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "RetentionCompactor":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="xray-retention", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def run_once(self) -> Dict[str, int]:
+        self.last_result = self.storage.compact(self.policy)
+        if self.on_compact is not None:
+            self.on_compact(self.last_result)
+        return self.last_result
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                result = self.run_once()
+                logger.debug("X-Ray retention: %s", result)
+            except Exception:
+                logger.exception("X-Ray retention compaction failed")
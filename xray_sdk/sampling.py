@@ -0,0 +1,127 @@
+import random
+from typing import Any, Dict, Iterable, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .core import Execution
+
+
+CAPTURE_LEVELS = ("summary", "standard", "full")
+
+DEFAULT_KEEP_STATUSES = ("error", "all_failed", "no_competitor_found")
+
+
+def _is_scalar(value: Any) -> bool:
+    return value is None or isinstance(value, (str, int, float, bool))
+
+
+def _truncate(value: Any, max_items: int, path: str, cut: Dict[str, int]) -> Any:
+    if isinstance(value, dict):
+        return {key: _truncate(item, max_items, f"{path}.{key}", cut) for key, item in value.items()}
+    if isinstance(value, list):
+        if len(value) > max_items:
+            cut[path] = len(value)
+            value = value[:max_items]
+        return [_truncate(item, max_items, f"{path}[]", cut) for item in value]
+    return value
+
+
+def _summarize(values: Dict[str, Any], path: str, cut: Dict[str, int]) -> Dict[str, Any]:
+    kept = {}
+    for key, value in values.items():
+        if isinstance(value, dict) and isinstance(value.get("$ref"), str):
+            # Summary captures register no entities, so keep the id instead of an unresolvable reference.
+            kept[key] = value["$ref"]
+        elif _is_scalar(value) or (isinstance(value, dict) and all(_is_scalar(item) for item in value.values())):
+            kept[key] = value
+        else:
+            cut[f"{path}.{key}"] = len(value) if isinstance(value, (list, dict)) else 1
+    return kept
+
+
+class SamplingPolicy:
+    """
+    Decides which executions are recorded in detail and which are persisted.
+
+    Head sampling: when an execution starts, it is sampled with probability
+    `rates.get(name, rate)`. Sampled executions capture steps at `capture_levels.get(name, capture_level)`;
+    the rest capture at `unsampled_capture_level`, which keeps recording cheap.
+
+    Tail retention: an unsampled execution is still persisted when any step
+    reports a status in `keep_statuses`, or when its top-level steps took longer
+    than `latency_threshold_ms` in total.
+
+    Capture levels:
+      - "full": inputs, outputs and metadata as given.
+      - "standard": lists longer than `max_list_items` are cut to that length.
+      - "summary": only scalars and flat dicts of scalars are kept (statuses,
+        counts, errors); lists and nested structures such as `evaluations` are dropped,
+        and entity references are replaced by the entity id.
+    Whatever is cut is noted in the step's metadata["capture"].
+    """
+
+    def __init__(
+        self,
+        rate: float = 1.0,
+        rates: Optional[Dict[str, float]] = None,
+        keep_statuses: Iterable[str] = DEFAULT_KEEP_STATUSES,
+        latency_threshold_ms: Optional[float] = None,
+        capture_level: str = "full",
+        capture_levels: Optional[Dict[str, str]] = None,
+        unsampled_capture_level: str = "summary",
+        max_list_items: int = 20,
+    ):
+        capture_levels = dict(capture_levels or {})
+        for level in (capture_level, unsampled_capture_level, *capture_levels.values()):
+            if level not in CAPTURE_LEVELS:
+                raise ValueError(f"capture level must be one of {CAPTURE_LEVELS}, got {level!r}")
+
+        self.rate = rate
+        self.rates = dict(rates or {})
+        self.keep_statuses = frozenset(keep_statuses)
+        self.latency_threshold_ms = latency_threshold_ms
+        self.capture_level = capture_level
+        self.capture_levels = capture_levels
+        self.unsampled_capture_level = unsampled_capture_level
+        self.max_list_items = max_list_items
+
+    def head_sample(self, name: str) -> Tuple[bool, str]:
+        """Sampling decision and capture level for a new execution called `name`."""
+        rate = self.rates.get(name, self.rate)
+        if rate >= 1.0 or random.random() < rate:
+            return True, self.capture_levels.get(name, self.capture_level)
+        return False, self.unsampled_capture_level
+
+    def retention_reason(self, execution: "Execution") -> Optional[str]:
+        """Why a finished execution should be persisted ("head", "status:<s>", "latency"), or None to drop it."""
+        if execution.metadata.get("sampling", {}).get("head_sampled", True):
+            return "head"
+        for step in execution.steps:
+            status = step.outputs.get("status")
+            if status in self.keep_statuses:
+                return f"status:{status}"
+        if self.latency_threshold_ms is not None:
+            total = execution.summary()["total_duration_ms"]
+            if total is not None and total > self.latency_threshold_ms:
+                return "latency"
+        return None
+
+    def capture(
+        self, level: str, inputs: Dict[str, Any], outputs: Dict[str, Any], metadata: Dict[str, Any]
+    ) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]:
+        """Reduce a step's payloads to `level`."""
+        if level == "full":
+            return inputs, outputs, metadata
+
+        cut: Dict[str, int] = {}
+        if level == "summary":
+            inputs = _summarize(inputs, "inputs", cut)
+            outputs = _summarize(outputs, "outputs", cut)
+            metadata = _summarize(metadata, "metadata", cut)
+        else:
+            inputs = _truncate(inputs, self.max_list_items, "inputs", cut)
+            outputs = _truncate(outputs, self.max_list_items, "outputs", cut)
+            metadata = _truncate(metadata, self.max_list_items, "metadata", cut)
+
+        if cut:
+            metadata["capture"] = {"level": level, "cut": cut}
+        return inputs, outputs, metadata
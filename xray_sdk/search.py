@@ -0,0 +1,261 @@
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, TYPE_CHECKING
+
+from .retention import plan_retention
+from .sqlite_storage import _ThreadLocalConnections
+from .storage import Storage
+
+if TYPE_CHECKING:
+    from .core import Execution
+    from .retention import RetentionPolicy
+    from .views import ExecutionView
+
+
+_TABLES = """
+CREATE TABLE IF NOT EXISTS indexed_executions (
+    execution_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    first_document INTEGER NOT NULL,
+    last_document INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_indexed_executions_started_at ON indexed_executions(started_at);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS documents USING fts5(
+    execution_id UNINDEXED,
+    started_at UNINDEXED,
+    position UNINDEXED,
+    name,
+    step_name,
+    asin,
+    title,
+    text,
+    tokenize = "unicode61 tokenchars '_-'"
+);
+"""
+
+# Columns a search can be restricted to, besides the free-text query over all of them.
+SEARCH_COLUMNS = ("name", "step_name", "asin", "title", "text")
+
+
+def _phrase(term: str) -> str:
+    """One FTS5 string (a trailing * makes it a prefix query), so user input is never parsed as query syntax."""
+    prefix = term.endswith("*")
+    term = term.rstrip("*")
+    return '"' + term.replace('"', '""') + '"' + ("*" if prefix else "")
+
+
+def _collect(value: Any, candidates: Dict[str, Dict[str, Any]], loose: List[str], current: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Walk a step payload: every dict with a string "asin" is a candidate, and
+    string (or list of string) values under keys containing "reason" or
+    "failed" (rejection_reasons, failed_filters) count as its reasons, or as
+    the step's own if no candidate encloses them.
+    """
+    if isinstance(value, dict):
+        asin = value.get("asin")
+        if isinstance(asin, str):
+            current = candidates.setdefault(asin, {"title": "", "reasons": []})
+            if isinstance(value.get("title"), str):
+                current["title"] = value["title"]
+        for key, item in value.items():
+            if ("reason" in key or "failed" in key) and key != "reasoning":
+                reasons = [item] if isinstance(item, str) else item if isinstance(item, list) else []
+                target = current["reasons"] if current is not None else loose
+                target.extend(reason for reason in reasons if isinstance(reason, str))
+            _collect(item, candidates, loose, current)
+    elif isinstance(value, list):
+        for item in value:
+            _collect(item, candidates, loose, current)
+
+
+def execution_documents(execution: "Execution") -> Iterator[Tuple[int, str, str, str, str]]:
+    """(position, step_name, asin, title, text) rows: one per step, plus one per candidate a step mentions."""
+    for position, step in enumerate(execution.to_dict()["steps"]):
+        candidates: Dict[str, Dict[str, Any]] = {}
+        loose: List[str] = []
+        for field in ("inputs", "outputs", "metadata"):
+            _collect(step.get(field), candidates, loose)
+        yield position, step["name"], "", "", " ".join([step.get("reasoning") or "", *loose]).strip()
+        for asin, candidate in candidates.items():
+            yield position, step["name"], asin, candidate["title"], " ".join(dict.fromkeys(candidate["reasons"]))
+
+
+class SearchIndex:
+    """
+    SQLite FTS5 index over executions: one document per step (its reasoning)
+    and one per candidate a step mentions (ASIN, title, and rejection reasons
+    or failed filters), each tagged with the execution and step name. Hits
+    come newest first and page by document id, so a query reads only as many
+    postings as it returns.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, busy_timeout_ms: int = 5000):
+        if db_path is None:
+            db_path = "./xray_storage/search.db"
+
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.busy_timeout_ms = busy_timeout_ms
+        self._connections = _ThreadLocalConnections(self.db_path, busy_timeout_ms)
+
+        with self._connection() as conn:
+            conn.executescript(_TABLES)
+
+    def add(self, executions: Iterable["Execution"]) -> None:
+        """Index executions, replacing any earlier version of the same execution_id."""
+        with self._connection() as conn:
+            for execution in executions:
+                self._remove(conn, [execution.execution_id])
+                rows = [
+                    (execution.execution_id, execution.started_at, position, execution.name, step_name, asin, title, text)
+                    for position, step_name, asin, title, text in execution_documents(execution)
+                ]
+                conn.executemany(
+                    "INSERT INTO documents (execution_id, started_at, position, name, step_name, asin, title, text)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                # A transaction's rows get consecutive rowids, so the range identifies them for _remove.
+                last = conn.execute("SELECT last_insert_rowid()").fetchone()[0] if rows else 0
+                conn.execute(
+                    "INSERT INTO indexed_executions VALUES (?, ?, ?, ?, ?)",
+                    (execution.execution_id, execution.name, execution.started_at, last - len(rows) + 1, last),
+                )
+
+    def remove(self, execution_ids: Iterable[str]) -> None:
+        with self._connection() as conn:
+            self._remove(conn, list(execution_ids))
+
+    def search(
+        self,
+        query: Optional[str] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        **columns: Optional[str],
+    ) -> List[Dict[str, Any]]:
+        """
+        Newest hits first. `query` is whitespace-separated terms that must all
+        appear (a trailing * matches prefixes); `columns` (name, step_name, asin,
+        title, and text: reasoning and rejection reasons) restrict terms to one
+        column. Pass a hit's "document_id" as `cursor` for the next page.
+        """
+        unknown = set(columns) - set(SEARCH_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown search columns: {', '.join(sorted(unknown))}")
+        terms = [_phrase(term) for term in (query or "").split()]
+        for column, value in columns.items():
+            if value:
+                terms.append(f"{column} : ({' '.join(_phrase(term) for term in value.split())})")
+        if not terms:
+            raise ValueError("Search needs a query or a column filter")
+
+        sql = (
+            "SELECT rowid AS document_id, execution_id, started_at, position, name, step_name, asin, title,"
+            " snippet(documents, 7, '[', ']', '...', 16) AS snippet"
+            " FROM documents WHERE documents MATCH ?"
+        )
+        params: List[Any] = [" AND ".join(terms)]
+        if cursor is not None:
+            if not cursor.isdigit():
+                raise ValueError(f"Invalid cursor: {cursor!r}")
+            sql += " AND rowid < ?"
+            params.append(int(cursor))
+        sql += " ORDER BY rowid DESC LIMIT ?"
+        params.append(limit)
+        return [dict(row) for row in self._connection().execute(sql, params)]
+
+    def count(self) -> int:
+        """Number of indexed executions."""
+        return self._connection().execute("SELECT COUNT(*) FROM indexed_executions").fetchone()[0]
+
+    def apply_retention(self, policy: "RetentionPolicy", now: Optional[datetime] = None) -> int:
+        """
+        Drop executions `policy` deletes from storage. Sizes aren't known here, so
+        `max_bytes` is not applied; hits for executions it removed no longer load.
+        """
+        conn = self._connection()
+        entries = [dict(row) for row in conn.execute("SELECT execution_id, name, started_at FROM indexed_executions")]
+        delete, _ = plan_retention(entries, policy, now)
+        self.remove(delete)
+        return len(delete)
+
+    def close(self) -> None:
+        self._connections.close()
+
+    def _remove(self, conn: sqlite3.Connection, execution_ids: List[str]) -> None:
+        for execution_id in execution_ids:
+            row = conn.execute(
+                "SELECT first_document, last_document FROM indexed_executions WHERE execution_id = ?", (execution_id,)
+            ).fetchone()
+            if row is None:
+                continue
+            conn.execute("DELETE FROM documents WHERE rowid BETWEEN ? AND ?", (row["first_document"], row["last_document"]))
+            conn.execute("DELETE FROM indexed_executions WHERE execution_id = ?", (execution_id,))
+
+    def _connection(self) -> sqlite3.Connection:
+        return self._connections.get()
+
+
+class IndexedStorage(Storage):
+    """Wraps another Storage and adds every execution saved through it to a SearchIndex."""
+
+    def __init__(self, storage: Storage, index: Optional[SearchIndex] = None):
+        self.storage = storage
+        self.index = index if index is not None else SearchIndex()
+
+    def save_execution(self, execution: "Execution") -> None:
+        self.save_executions([execution])
+
+    def save_executions(self, executions: Iterable["Execution"]) -> None:
+        executions = list(executions)
+        self.storage.save_executions(executions)
+        self.index.add(executions)
+
+    def load_execution(self, execution_id: str) -> Optional["Execution"]:
+        return self.storage.load_execution(execution_id)
+
+    def load_execution_view(self, execution_id: str) -> Optional["ExecutionView"]:
+        return self.storage.load_execution_view(execution_id)
+
+    def list_executions(self, limit: int = 100, cursor: Optional[str] = None, **filters: Any) -> List["Execution"]:
+        return self.storage.list_executions(limit=limit, cursor=cursor, **filters)
+
+    def list_execution_summaries(self, limit: int = 100, cursor: Optional[str] = None, **filters: Any) -> List[Dict[str, Any]]:
+        return self.storage.list_execution_summaries(limit=limit, cursor=cursor, **filters)
+
+    def search(self, query: Optional[str] = None, limit: int = 50, cursor: Optional[str] = None, **columns: Optional[str]) -> List[Dict[str, Any]]:
+        return self.index.search(query, limit=limit, cursor=cursor, **columns)
+
+    def iter_execution_ids(self, batch_size: int = 100) -> Iterator[str]:
+        return self.storage.iter_execution_ids(batch_size)
+
+    def reindex(self, batch_size: int = 100) -> int:
+        """
+        Index everything already in the wrapped storage, e.g. after adding search
+        to existing data. Goes oldest first, so hits still come newest first.
+        """
+        execution_ids = list(self.storage.iter_execution_ids(batch_size))
+        execution_ids.reverse()
+        count = 0
+        for start in range(0, len(execution_ids), batch_size):
+            executions = [self.storage.load_execution(execution_id) for execution_id in execution_ids[start:start + batch_size]]
+            executions = [execution for execution in executions if execution is not None]
+            self.index.add(executions)
+            count += len(executions)
+        return count
+
+    def compact(self, policy: "RetentionPolicy", now: Optional[datetime] = None) -> Dict[str, int]:
+        result = self.storage.compact(policy, now)
+        result["unindexed"] = self.index.apply_retention(policy, now)
+        return result
+
+    def flush(self) -> None:
+        self.storage.flush()
+
+    def close(self) -> None:
+        self.storage.close()
+        self.index.close()
@@ -0,0 +1,267 @@
+import mmap
+import os
+import re
+import struct
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TYPE_CHECKING
+
+from .codecs import Serializer, json_loads
+from .storage import Storage, _IndexLog, execution_from_dict, filter_index_entries, index_entry, summary_from_entry
+
+if TYPE_CHECKING:
+    from .core import Execution
+    from .retention import RetentionPolicy
+
+
+_HEADER = struct.Struct("<4sI")
+_MAGIC = b"XRS1"
+_SEGMENT_PATTERN = re.compile(r"segment-(\d{8})\.log$")
+
+
+def _segment_name(number: int) -> str:
+    return f"segment-{number:08d}.log"
+
+
+class SegmentStorage(Storage):
+    """
+    Log-structured storage: executions are appended as length-prefixed records
+    to rolling segment files, and an offset index (the same append-only
+    index.jsonl JSONFileStorage uses, plus segment/offset/length per entry)
+    locates them. Loading one execution is a single read at a known offset;
+    sealed segments (all but the newest) are memory-mapped for reads.
+
+    Segments roll over once they reach `segment_bytes`, so retention can drop
+    whole files with drop_segments() instead of deleting executions one by one.
+    """
+
+    def __init__(
+        self,
+        storage_path: Optional[str] = None,
+        segment_bytes: int = 64 * 1024 * 1024,
+        codec: str = "json",
+        compression: Optional[str] = None,
+        compact_every: int = 10000,
+        fsync: bool = True,
+    ):
+        if storage_path is None:
+            storage_path = "./xray_storage/segments"
+
+        self.base_path = Path(storage_path)
+        self.base_path.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self._serializer = Serializer(codec, compression)
+        self._index = _IndexLog(self.base_path / "index.jsonl", compact_every=compact_every)
+
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._index_inode: Optional[int] = None
+        self._index_position = 0
+        self._newest_segment = ""
+        self._maps: Dict[str, mmap.mmap] = {}
+
+    def save_execution(self, execution: "Execution") -> None:
+        self.save_executions([execution])
+
+    def save_executions(self, executions: Iterable["Execution"]) -> None:
+        records = [(execution, self._serializer.encode(execution.to_dict(expand_refs=False))) for execution in executions]
+        if not records:
+            return
+
+        with self._index.lock():
+            segment = self._active_segment()
+            entries = []
+            f = open(self.base_path / segment, "ab")
+            try:
+                offset = f.tell()
+                for execution, payload in records:
+                    if offset and offset + _HEADER.size + len(payload) > self.segment_bytes:
+                        self._finish_write(f)
+                        segment = _segment_name(int(_SEGMENT_PATTERN.match(segment).group(1)) + 1)
+                        f = open(self.base_path / segment, "ab")
+                        offset = 0
+                    f.write(_HEADER.pack(_MAGIC, len(payload)))
+                    f.write(payload)
+                    entry = index_entry(execution)
+                    entry.update(segment=segment, offset=offset + _HEADER.size, length=len(payload))
+                    entries.append(entry)
+                    offset += _HEADER.size + len(payload)
+            finally:
+                self._finish_write(f)
+            self._index.append_locked(entries)
+        self._index.maybe_compact()
+
+    def load_execution(self, execution_id: str) -> Optional["Execution"]:
+        with self._lock:
+            self._refresh()
+            entry = self._entries.get(execution_id)
+        if entry is None:
+            return None
+        data = self._read_record(entry)
+        if data is None:
+            return None
+        return execution_from_dict(self._serializer.decode(data))
+
+    def list_executions(self, limit: int = 100, cursor: Optional[str] = None, **filters: Any) -> List["Execution"]:
+        result = []
+        entries = [entry for entry in filter_index_entries(self._snapshot(), cursor, **filters) if "segment" in entry]
+        for entry in entries[:limit]:
+            data = self._read_record(entry)
+            if data is not None:
+                result.append(execution_from_dict(self._serializer.decode(data)))
+        return result
+
+    def list_execution_summaries(self, limit: int = 100, cursor: Optional[str] = None, **filters: Any) -> List[Dict[str, Any]]:
+        return [summary_from_entry(entry) for entry in filter_index_entries(self._snapshot(), cursor, **filters)[:limit]]
+
+    def iter_execution_ids(self, batch_size: int = 100) -> Iterator[str]:
+        for entry in filter_index_entries(self._snapshot()):
+            if "segment" in entry:
+                yield entry["execution_id"]
+
+    def drop_segments(self, before: str) -> int:
+        """
+        Delete sealed segments whose executions all started before `before`
+        (an ISO timestamp). Returns the number of segments removed.
+        """
+        with self._index.lock():
+            newest_start: Dict[str, str] = {}
+            for entry in self._index.entries():
+                segment = entry.get("segment")
+                if segment is not None and entry.get("started_at", "") > newest_start.get(segment, ""):
+                    newest_start[segment] = entry["started_at"]
+            doomed = {segment for segment in self._segment_names()[:-1] if newest_start.get(segment, "") < before}
+            if doomed:
+                self._index.compact_locked(lambda entry: None if entry.get("segment") in doomed else entry)
+                self._remove_segments(doomed)
+        return len(doomed)
+
+    def compact(self, policy: "RetentionPolicy", now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Apply a retention policy to the index, then delete sealed segments no live
+        entry points into anymore. Downsampled executions keep their index entry
+        (and so their summary) but lose their segment reference.
+        """
+        from .retention import plan_retention
+
+        with self._index.lock():
+            entries = self._index.entries()
+            for entry in entries:
+                entry["bytes"] = entry.get("length", 0)
+            delete, downsample = plan_retention(entries, policy, now)
+            if delete or downsample:
+                def rewrite(entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+                    if entry["execution_id"] in delete:
+                        return None
+                    if entry["execution_id"] in downsample:
+                        entry["downsampled"] = True
+                        for key in ("segment", "offset", "length"):
+                            entry.pop(key, None)
+                    return entry
+
+                self._index.compact_locked(rewrite)
+            live = {entry.get("segment") for entry in self._index.entries()}
+            dead = {segment for segment in self._segment_names()[:-1] if segment not in live}
+            self._remove_segments(dead)
+        return {"deleted": len(delete), "downsampled": len(downsample), "segments_dropped": len(dead)}
+
+    def compact_index(self) -> None:
+        self._index.compact()
+
+    def close(self) -> None:
+        with self._lock:
+            for segment_map in self._maps.values():
+                segment_map.close()
+            self._maps.clear()
+
+    def _remove_segments(self, segments: Iterable[str]) -> None:
+        with self._lock:
+            for segment in segments:
+                segment_map = self._maps.pop(segment, None)
+                if segment_map is not None:
+                    segment_map.close()
+                (self.base_path / segment).unlink(missing_ok=True)
+
+    def _segment_names(self) -> List[str]:
+        return sorted(path.name for path in self.base_path.iterdir() if _SEGMENT_PATTERN.match(path.name))
+
+    def _active_segment(self) -> str:
+        segments = self._segment_names()
+        if not segments:
+            return _segment_name(1)
+        newest = segments[-1]
+        if (self.base_path / newest).stat().st_size >= self.segment_bytes:
+            return _segment_name(int(_SEGMENT_PATTERN.match(newest).group(1)) + 1)
+        return newest
+
+    def _finish_write(self, f) -> None:
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+        f.close()
+
+    def _snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._refresh()
+            return list(self._entries.values())
+
+    def _refresh(self) -> None:
+        """Read index lines appended since the last call; start over if the index was rewritten."""
+        try:
+            stat = os.stat(self._index.path)
+        except FileNotFoundError:
+            self._entries = {}
+            self._index_inode = None
+            self._index_position = 0
+            return
+        if stat.st_ino != self._index_inode or stat.st_size < self._index_position:
+            self._entries = {}
+            self._index_inode = stat.st_ino
+            self._index_position = 0
+            self._newest_segment = ""
+        if stat.st_size == self._index_position:
+            return
+
+        with open(self._index.path, "rb") as f:
+            f.seek(self._index_position)
+            chunk = f.read()
+        end = chunk.rfind(b"\n") + 1
+        for line in chunk[:end].splitlines():
+            try:
+                entry = json_loads(line)
+            except ValueError:
+                continue
+            self._entries.pop(entry["execution_id"], None)
+            self._entries[entry["execution_id"]] = entry
+            if entry.get("segment", "") > self._newest_segment:
+                self._newest_segment = entry["segment"]
+        self._index_position += end
+
+    def _read_record(self, entry: Dict[str, Any]) -> Optional[bytes]:
+        segment = entry.get("segment")
+        if segment is None:
+            return None
+        offset, length = entry["offset"], entry["length"]
+        try:
+            with self._lock:
+                if segment < self._newest_segment:
+                    segment_map = self._maps.get(segment)
+                    if segment_map is None:
+                        with open(self.base_path / segment, "rb") as f:
+                            segment_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                        self._maps[segment] = segment_map
+                    header = _HEADER.unpack_from(segment_map, offset - _HEADER.size)
+                    data = segment_map[offset:offset + length]
+                else:
+                    with open(self.base_path / segment, "rb") as f:
+                        f.seek(offset - _HEADER.size)
+                        raw = f.read(_HEADER.size + length)
+                    header = _HEADER.unpack_from(raw)
+                    data = raw[_HEADER.size:]
+        except FileNotFoundError:
+            return None
+        if header != (_MAGIC, length):
+            raise ValueError(f"Corrupt record for execution {entry['execution_id']} in {segment} at offset {offset}")
+        return data
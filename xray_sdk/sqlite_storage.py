@@ -0,0 +1,320 @@
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, TYPE_CHECKING
+
+from .codecs import json_dumps, json_loads
+from .storage import SUMMARY_FIELDS, Storage, decode_cursor, summary_from_entry
+
+if TYPE_CHECKING:
+    from .core import Execution
+    from .retention import RetentionPolicy
+
+
+_TABLES = """
+CREATE TABLE IF NOT EXISTS executions (
+    execution_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    ended_at TEXT,
+    reference_product_id TEXT,
+    metadata TEXT NOT NULL,
+    step_count INTEGER NOT NULL DEFAULT 0,
+    total_duration_ms REAL,
+    status TEXT,
+    entities TEXT,
+    downsampled INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS steps (
+    execution_id TEXT NOT NULL REFERENCES executions(execution_id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    inputs TEXT NOT NULL,
+    outputs TEXT NOT NULL,
+    reasoning TEXT,
+    metadata TEXT NOT NULL,
+    timestamp TEXT,
+    duration_ms REAL,
+    status TEXT,
+    step_id TEXT,
+    parent_step_id TEXT,
+    ended_at TEXT,
+    PRIMARY KEY (execution_id, position)
+);
+"""
+
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_executions_name ON executions(name, started_at, execution_id);
+CREATE INDEX IF NOT EXISTS idx_executions_started_at ON executions(started_at, execution_id);
+CREATE INDEX IF NOT EXISTS idx_executions_reference_product_id ON executions(reference_product_id);
+CREATE INDEX IF NOT EXISTS idx_steps_status ON steps(status, name, execution_id);
+"""
+
+_MIGRATIONS = {
+    "executions": {
+        "step_count": "ALTER TABLE executions ADD COLUMN step_count INTEGER NOT NULL DEFAULT 0",
+        "total_duration_ms": "ALTER TABLE executions ADD COLUMN total_duration_ms REAL",
+        "status": "ALTER TABLE executions ADD COLUMN status TEXT",
+        "entities": "ALTER TABLE executions ADD COLUMN entities TEXT",
+        "downsampled": "ALTER TABLE executions ADD COLUMN downsampled INTEGER NOT NULL DEFAULT 0",
+    },
+    "steps": {
+        "status": "ALTER TABLE steps ADD COLUMN status TEXT",
+        "step_id": "ALTER TABLE steps ADD COLUMN step_id TEXT",
+        "parent_step_id": "ALTER TABLE steps ADD COLUMN parent_step_id TEXT",
+        "ended_at": "ALTER TABLE steps ADD COLUMN ended_at TEXT",
+    },
+}
+
+_SUMMARY_COLUMNS = ", ".join(SUMMARY_FIELDS)
+
+
+def _dumps(value: Any) -> str:
+    return json_dumps(value)
+
+
+class _ThreadLocalConnections:
+    """
+    One SQLite connection per thread (WAL mode, so readers don't block the
+    writer), all closed together by close().
+    """
+
+    def __init__(self, db_path: Path, busy_timeout_ms: int):
+        self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def get(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout_ms / 1000, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self) -> None:
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+class SQLiteStorage(Storage):
+    """
+    Executions and steps in normalized SQLite tables. WAL mode lets readers
+    (the API server) run while writers (pipelines) commit; each thread gets
+    its own connection.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, busy_timeout_ms: int = 5000):
+        if db_path is None:
+            db_path = "./xray_storage/xray.db"
+
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.busy_timeout_ms = busy_timeout_ms
+        self._connections = _ThreadLocalConnections(self.db_path, busy_timeout_ms)
+
+        with self._connection() as conn:
+            conn.executescript(_TABLES)
+            for table, migrations in _MIGRATIONS.items():
+                columns = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+                for column, statement in migrations.items():
+                    if column not in columns:
+                        conn.execute(statement)
+            conn.executescript(_INDEXES)
+
+    def save_execution(self, execution: "Execution") -> None:
+        self.save_executions([execution])
+
+    def save_executions(self, executions: Iterable["Execution"]) -> None:
+        execution_rows = []
+        step_rows = []
+        execution_ids = []
+        for execution in executions:
+            summary = execution.summary()
+            execution_ids.append((execution.execution_id,))
+            execution_rows.append((
+                execution.execution_id,
+                execution.name,
+                execution.started_at,
+                execution.ended_at,
+                execution.metadata.get("reference_product_id"),
+                _dumps(execution.metadata),
+                summary["step_count"],
+                summary["total_duration_ms"],
+                summary["status"],
+                _dumps(execution.entities) if execution.entities else None,
+            ))
+            for position, step in enumerate(execution.steps):
+                step_rows.append((
+                    execution.execution_id,
+                    position,
+                    step.name,
+                    _dumps(step.inputs),
+                    _dumps(step.outputs),
+                    step.reasoning,
+                    _dumps(step.metadata),
+                    step.timestamp,
+                    step.duration_ms,
+                    step.outputs.get("status"),
+                    step.step_id,
+                    step.parent_step_id,
+                    step.ended_at,
+                ))
+
+        with self._connection() as conn:
+            conn.executemany("DELETE FROM steps WHERE execution_id = ?", execution_ids)
+            conn.executemany(
+                "INSERT OR REPLACE INTO executions "
+                "(execution_id, name, started_at, ended_at, reference_product_id, metadata, "
+                "step_count, total_duration_ms, status, entities) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                execution_rows,
+            )
+            conn.executemany(
+                "INSERT INTO steps "
+                "(execution_id, position, name, inputs, outputs, reasoning, metadata, timestamp, duration_ms, status, "
+                "step_id, parent_step_id, ended_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                step_rows,
+            )
+
+    def load_execution(self, execution_id: str) -> Optional["Execution"]:
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT * FROM executions WHERE execution_id = ? AND downsampled = 0", (execution_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return self._hydrate([row])[0]
+
+    def list_executions(self, limit: int = 100, cursor: Optional[str] = None, **filters: Any) -> List["Execution"]:
+        return self._hydrate(self._query("*", limit, cursor, payload_only=True, **filters))
+
+    def list_execution_summaries(self, limit: int = 100, cursor: Optional[str] = None, **filters: Any) -> List[Dict[str, Any]]:
+        return [summary_from_entry(dict(row)) for row in self._query(_SUMMARY_COLUMNS, limit, cursor, **filters)]
+
+    def compact(self, policy: "RetentionPolicy", now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Downsampled executions keep their executions row (the summary) and lose their
+        steps. Freed pages are reused by later writes rather than returned to the OS.
+        """
+        from .retention import plan_retention
+        
+        conn = self._connection()
+        rows = conn.execute(
+            "SELECT e.execution_id, e.name, e.started_at, e.downsampled, "
+            "length(e.metadata) + COALESCE(length(e.entities), 0) + COALESCE(SUM("
+            "length(s.inputs) + length(s.outputs) + length(s.metadata) + COALESCE(length(s.reasoning), 0)), 0) AS bytes "
+            "FROM executions e LEFT JOIN steps s ON s.execution_id = e.execution_id GROUP BY e.execution_id"
+        ).fetchall()
+        delete, downsample = plan_retention([dict(row) for row in rows], policy, now)
+        with conn:
+            conn.executemany("DELETE FROM steps WHERE execution_id = ?", [(i,) for i in delete | downsample])
+            conn.executemany("DELETE FROM executions WHERE execution_id = ?", [(i,) for i in delete])
+            conn.executemany(
+                "UPDATE executions SET downsampled = 1, entities = NULL WHERE execution_id = ?", [(i,) for i in downsample]
+            )
+        return {"deleted": len(delete), "downsampled": len(downsample)}
+    
+    def close(self) -> None:
+        self._connections.close()
+
+    def _query(
+        self,
+        columns: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        name: Optional[str] = None,
+        started_after: Optional[str] = None,
+        started_before: Optional[str] = None,
+        reference_product_id: Optional[str] = None,
+        step_status: Optional[str] = None,
+        payload_only: bool = False,
+    ) -> List[sqlite3.Row]:
+        clauses = ["downsampled = 0"] if payload_only else []
+        params: List[Any] = []
+        if cursor:
+            started_at, execution_id = decode_cursor(cursor)
+            clauses.append("(started_at < ? OR (started_at = ? AND execution_id < ?))")
+            params.extend([started_at, started_at, execution_id])
+        if name is not None:
+            clauses.append("name = ?")
+            params.append(name)
+        if started_after is not None:
+            clauses.append("started_at >= ?")
+            params.append(started_after)
+        if started_before is not None:
+            clauses.append("started_at < ?")
+            params.append(started_before)
+        if reference_product_id is not None:
+            clauses.append("reference_product_id = ?")
+            params.append(reference_product_id)
+        if step_status is not None:
+            if ":" in step_status:
+                step_name, status = step_status.rsplit(":", 1)
+                clauses.append("execution_id IN (SELECT execution_id FROM steps WHERE status = ? AND name = ?)")
+                params.extend([status, step_name])
+            else:
+                clauses.append("execution_id IN (SELECT execution_id FROM steps WHERE status = ?)")
+                params.append(step_status)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._connection().execute(
+            f"SELECT {columns} FROM executions {where} ORDER BY started_at DESC, execution_id DESC LIMIT ?",
+            [*params, limit],
+        ).fetchall()
+
+    def _connection(self) -> sqlite3.Connection:
+        return self._connections.get()
+
+    def _hydrate(self, execution_rows: List[sqlite3.Row]) -> List["Execution"]:
+        from .core import Execution, Step
+
+        if not execution_rows:
+            return []
+
+        ids = [row["execution_id"] for row in execution_rows]
+        placeholders = ",".join("?" for _ in ids)
+        steps_by_execution: Dict[str, List[Step]] = {execution_id: [] for execution_id in ids}
+        for row in self._connection().execute(
+            f"SELECT * FROM steps WHERE execution_id IN ({placeholders}) ORDER BY execution_id, position",
+            ids,
+        ):
+            steps_by_execution[row["execution_id"]].append(Step(
+                name=row["name"],
+                inputs=json_loads(row["inputs"]),
+                outputs=json_loads(row["outputs"]),
+                reasoning=row["reasoning"],
+                metadata=json_loads(row["metadata"]),
+                timestamp=row["timestamp"],
+                duration_ms=row["duration_ms"],
+                step_id=row["step_id"],
+                parent_step_id=row["parent_step_id"],
+                ended_at=row["ended_at"],
+            ))
+
+        return [
+            Execution(
+                execution_id=row["execution_id"],
+                name=row["name"],
+                steps=steps_by_execution[row["execution_id"]],
+                started_at=row["started_at"],
+                ended_at=row["ended_at"],
+                metadata=json_loads(row["metadata"]),
+                entities=json_loads(row["entities"]) if row["entities"] else {},
+            )
+            for row in execution_rows
+        ]
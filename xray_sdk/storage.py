@@ -1,110 +1,465 @@
+import asyncio
+import base64
 import json
+import os
+from contextlib import contextmanager
+from datetime import datetime
 from pathlib import Path
-from typing import List, Optional, TYPE_CHECKING
+from typing import Any, Callable, ContextManager, Dict, Iterable, Iterator, List, Optional, Tuple, TYPE_CHECKING
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from .codecs import Serializer, json_dumps, json_loads
+from .views import ExecutionView, encode_indexed_json, load_indexed_json
 
 if TYPE_CHECKING:
     from .core import Execution
+    from .retention import RetentionPolicy
+
+
+@contextmanager
+def _file_lock(lock_path: Path) -> Iterator[None]:
+    """Exclusive advisory lock shared by every process using the same storage directory."""
+    with open(lock_path, "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _atomic_write(path: Path, data: Any) -> None:
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb" if isinstance(data, bytes) else "w") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class _IndexLog:
+    """
+    Append-only JSON Lines index. Each save appends one line under a file lock;
+    readers take the last line per execution_id, and compaction rewrites the log
+    through an atomic rename so concurrent readers never see a partial file.
+    """
+
+    def __init__(self, path: Path, compact_every: int = 1000):
+        self.path = path
+        self.lock_path = path.with_name(path.name + ".lock")
+        self.compact_every = compact_every
+        self._appends_since_compact = 0
+
+    def append(self, entry: Dict[str, Any]) -> None:
+        self.append_many([entry])
+    
+    def append_many(self, entries: List[Dict[str, Any]]) -> None:
+        with self.lock():
+            self.append_locked(entries)
+        self.maybe_compact()
+    
+    def lock(self) -> ContextManager[None]:
+        """The log's file lock, for callers that write related files together with the index."""
+        return _file_lock(self.lock_path)
+    
+    def append_locked(self, entries: List[Dict[str, Any]]) -> None:
+        """Append while already holding lock(); call maybe_compact() after releasing it."""
+        lines = "".join(json_dumps(entry) + "\n" for entry in entries)
+        with open(self.path, "a") as f:
+            f.write(lines)
+        self._appends_since_compact += len(entries)
+    
+    def maybe_compact(self) -> None:
+        if self.compact_every and self._appends_since_compact >= self.compact_every:
+            self.compact()
+
+    def entries(self) -> List[Dict[str, Any]]:
+        return list(self._read().values())
+
+    def compact(self, rewrite: Optional[Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]] = None) -> None:
+        """
+        Rewrite the log with one line per execution. `rewrite` may return a changed
+        entry, or None to drop it.
+        """
+        with _file_lock(self.lock_path):
+            self.compact_locked(rewrite)
+    
+    def compact_locked(self, rewrite: Optional[Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]] = None) -> None:
+        entries = self._read().values()
+        if rewrite is not None:
+            entries = [entry for entry in map(rewrite, entries) if entry is not None]
+        _atomic_write(self.path, "".join(json_dumps(entry) + "\n" for entry in entries))
+        self._appends_since_compact = 0
+
+    def migrate_legacy(self, legacy_path: Path) -> None:
+        if self.path.exists() or not legacy_path.exists():
+            return
+        with _file_lock(self.lock_path):
+            if self.path.exists():
+                return
+            with open(legacy_path, "r") as f:
+                legacy = json.load(f).get("executions", [])
+            _atomic_write(self.path, "".join(
+                json_dumps(entry) + "\n" for entry in reversed(legacy)
+            ))
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        entries: Dict[str, Dict[str, Any]] = {}
+        if not self.path.exists():
+            return entries
+        with open(self.path, "r") as f:
+            for line in f:
+                try:
+                    entry = json_loads(line)
+                except ValueError:
+                    continue
+                entries.pop(entry["execution_id"], None)
+                entries[entry["execution_id"]] = entry
+        return entries
+
+
+SUMMARY_FIELDS = ("execution_id", "name", "started_at", "ended_at", "step_count", "total_duration_ms", "status", "downsampled")
+
+
+def summary_from_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Summary fields of an index entry; `downsampled` tells clients there is no payload to load."""
+    summary = {field: entry.get(field) for field in SUMMARY_FIELDS}
+    summary["downsampled"] = bool(summary["downsampled"])
+    return summary
+
+
+def encode_cursor(entry: Dict[str, Any]) -> str:
+    """Opaque cursor pointing just past `entry` in (started_at, execution_id) descending order."""
+    raw = json.dumps([entry["started_at"], entry["execution_id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Inverse of encode_cursor; raises ValueError for anything it couldn't have produced."""
+    try:
+        decoded = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not (isinstance(decoded, list) and len(decoded) == 2 and all(isinstance(part, str) for part in decoded)):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    started_at, execution_id = decoded
+    return started_at, execution_id
+
+
+def index_entry(execution: "Execution") -> Dict[str, Any]:
+    entry = execution.summary()
+    entry["reference_product_id"] = execution.metadata.get("reference_product_id")
+    entry["step_statuses"] = [
+        f"{step.name}:{step.outputs['status']}" for step in execution.steps if step.outputs.get("status") is not None
+    ]
+    return entry
+
+
+def _matches_step_status(step_statuses: List[str], step_status: str) -> bool:
+    if ":" in step_status:
+        return step_status in step_statuses
+    return any(s.rsplit(":", 1)[1] == step_status for s in step_statuses)
+
+
+def filter_index_entries(
+    entries: Iterable[Dict[str, Any]],
+    cursor: Optional[str] = None,
+    name: Optional[str] = None,
+    started_after: Optional[str] = None,
+    started_before: Optional[str] = None,
+    reference_product_id: Optional[str] = None,
+    step_status: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Apply list_executions filters to index entries and return them newest first.
+    `step_status` is either "step_name:status" or a bare status matching any step.
+    """
+    position = decode_cursor(cursor) if cursor else None
+    result = []
+    for entry in entries:
+        key = (entry.get("started_at", ""), entry["execution_id"])
+        if position is not None and key >= position:
+            continue
+        if name is not None and entry.get("name") != name:
+            continue
+        if started_after is not None and key[0] < started_after:
+            continue
+        if started_before is not None and key[0] >= started_before:
+            continue
+        if reference_product_id is not None and entry.get("reference_product_id") != reference_product_id:
+            continue
+        if step_status is not None and not _matches_step_status(entry.get("step_statuses", []), step_status):
+            continue
+        result.append(entry)
+    result.sort(key=lambda x: (x.get("started_at", ""), x["execution_id"]), reverse=True)
+    return result
+
+
+def validate_execution_dict(data: Any) -> None:
+    """Raise ValueError unless `data` has the shape Execution.to_dict() produces, e.g. for data from clients."""
+    def check(value: Any, kind: type, where: str) -> None:
+        if not isinstance(value, kind):
+            raise ValueError(f"{where} must be {'an object' if kind is dict else 'a list' if kind is list else 'a string'}, got {type(value).__name__}")
+
+    check(data, dict, "execution")
+    for key in ("execution_id", "name", "started_at"):
+        check(data.get(key), str, f"execution.{key}")
+    for key in ("metadata", "entities"):
+        if data.get(key) is not None:
+            check(data[key], dict, f"execution.{key}")
+    check(data.get("steps", []), list, "execution.steps")
+    for i, step in enumerate(data.get("steps", [])):
+        check(step, dict, f"steps[{i}]")
+        check(step.get("name"), str, f"steps[{i}].name")
+        for key in ("inputs", "outputs"):
+            check(step.get(key), dict, f"steps[{i}].{key}")
+        if step.get("metadata") is not None:
+            check(step["metadata"], dict, f"steps[{i}].metadata")
+        if step.get("reasoning") is not None:
+            check(step["reasoning"], str, f"steps[{i}].reasoning")
+
+
+def execution_from_dict(data: Dict[str, Any]) -> "Execution":
+    from .core import Execution, Step
+    
+    steps = [
+        Step(
+            name=step["name"],
+            inputs=step["inputs"],
+            outputs=step["outputs"],
+            reasoning=step.get("reasoning"),
+            metadata=step.get("metadata", {}),
+            timestamp=step.get("timestamp"),
+            duration_ms=step.get("duration_ms"),
+            step_id=step.get("step_id"),
+            parent_step_id=step.get("parent_step_id"),
+            ended_at=step.get("ended_at")
+        )
+        for step in data.get("steps", [])
+    ]
+    
+    return Execution(
+        execution_id=data["execution_id"],
+        name=data["name"],
+        steps=steps,
+        started_at=data["started_at"],
+        ended_at=data.get("ended_at"),
+        metadata=data.get("metadata", {}),
+        entities=data.get("entities", {})
+    )
 
 
 class Storage:
     def save_execution(self, execution: "Execution") -> None:
         raise NotImplementedError
     
+    def save_executions(self, executions: Iterable["Execution"]) -> None:
+        for execution in executions:
+            self.save_execution(execution)
+    
     def load_execution(self, execution_id: str) -> Optional["Execution"]:
         raise NotImplementedError
     
-    def list_executions(self, limit: int = 100) -> List["Execution"]:
+    def load_execution_view(self, execution_id: str) -> Optional[ExecutionView]:
+        """Lazy view of an execution; backends that can locate single steps parse them only on access."""
+        execution = self.load_execution(execution_id)
+        return ExecutionView.from_execution(execution) if execution is not None else None
+    
+    def list_executions(
+        self,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        name: Optional[str] = None,
+        started_after: Optional[str] = None,
+        started_before: Optional[str] = None,
+        reference_product_id: Optional[str] = None,
+        step_status: Optional[str] = None,
+    ) -> List["Execution"]:
+        raise NotImplementedError
+    
+    def list_execution_summaries(self, limit: int = 100, cursor: Optional[str] = None, **filters: Any) -> List[Dict[str, Any]]:
+        return [summary_from_entry(execution.summary()) for execution in self.list_executions(limit=limit, cursor=cursor, **filters)]
+    
+    def iter_execution_ids(self, batch_size: int = 100) -> Iterator[str]:
+        """
+        Ids of every execution that still has its payload, newest first, e.g. to
+        rebuild a search index. Backends with an index read it once instead of
+        paging through list_execution_summaries.
+        """
+        cursor = None
+        while True:
+            summaries = self.list_execution_summaries(limit=batch_size, cursor=cursor)
+            for summary in summaries:
+                if not summary.get("downsampled"):
+                    yield summary["execution_id"]
+            if len(summaries) < batch_size:
+                return
+            cursor = encode_cursor(summaries[-1])
+    
+    def compact(self, policy: "RetentionPolicy", now: Optional[datetime] = None) -> Dict[str, int]:
+        """Apply a retention policy: delete or downsample old executions. Returns counts."""
         raise NotImplementedError
+    
+    def flush(self) -> None:
+        pass
+    
+    def close(self) -> None:
+        pass
+    
+    async def asave_execution(self, execution: "Execution") -> None:
+        await asyncio.to_thread(self.save_execution, execution)
+    
+    async def aload_execution(self, execution_id: str) -> Optional["Execution"]:
+        return await asyncio.to_thread(self.load_execution, execution_id)
+    
+    async def alist_executions(self, limit: int = 100, cursor: Optional[str] = None, **filters: Any) -> List["Execution"]:
+        return await asyncio.to_thread(self.list_executions, limit, cursor, **filters)
+    
+    async def alist_execution_summaries(self, limit: int = 100, cursor: Optional[str] = None, **filters: Any) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self.list_execution_summaries, limit, cursor, **filters)
 
 
 class JSONFileStorage(Storage):
-    def __init__(self, storage_path: Optional[str] = None):
+    """
+    One file per execution plus an index log. Files are written with `codec`
+    ("json" or "msgpack") and optional `compression` ("gzip" or "zstd"); reads
+    detect the format, so files written with other settings stay readable.
+    Uncompressed JSON files carry a step index, so load_execution_view() reads
+    step payloads one by one instead of parsing the whole file.
+    """
+    
+    def __init__(
+        self,
+        storage_path: Optional[str] = None,
+        compact_every: int = 1000,
+        codec: str = "json",
+        compression: Optional[str] = None,
+    ):
         if storage_path is None:
             storage_path = "./xray_storage"
         
         self.base_path = Path(storage_path)
         self.executions_dir = self.base_path / "executions"
-        self.index_file = self.base_path / "index.json"
+        self.index_file = self.base_path / "index.jsonl"
         
         self.executions_dir.mkdir(parents=True, exist_ok=True)
-        if not self.index_file.exists():
-            with open(self.index_file, "w") as f:
-                json.dump({"executions": []}, f, indent=2)
+        self._serializer = Serializer(codec, compression)
+        self._index = _IndexLog(self.index_file, compact_every=compact_every)
+        self._index.migrate_legacy(self.base_path / "index.json")
     
     def save_execution(self, execution: "Execution") -> None:
-        execution_file = self.executions_dir / f"{execution.execution_id}.json"
-        with open(execution_file, "w") as f:
-            json.dump(execution.to_dict(), f, indent=2, default=str)
-        self._update_index(execution.execution_id, execution.name, execution.started_at)
+        self.save_executions([execution])
+    
+    def save_executions(self, executions: Iterable["Execution"]) -> None:
+        entries = []
+        for execution in executions:
+            execution_file = self.executions_dir / f"{execution.execution_id}{self._serializer.extension}"
+            data = execution.to_dict(expand_refs=False)
+            if self._serializer.extension == ".json":
+                _atomic_write(execution_file, encode_indexed_json(data))
+            else:
+                _atomic_write(execution_file, self._serializer.encode(data))
+            entries.append(index_entry(execution))
+        if entries:
+            self._index.append_many(entries)
     
     def load_execution(self, execution_id: str) -> Optional["Execution"]:
-        execution_file = self.executions_dir / f"{execution_id}.json"
-        
-        if not execution_file.exists():
-            return None
-        
-        with open(execution_file, "r") as f:
-            data = json.load(f)
-        
-        return self._dict_to_execution(data)
+        for extension in self._serializer.extensions:
+            try:
+                with open(self.executions_dir / f"{execution_id}{extension}", "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                continue
+            return self._dict_to_execution(self._serializer.decode(data))
+        return None
     
-    def list_executions(self, limit: int = 100) -> List["Execution"]:
+    def load_execution_view(self, execution_id: str) -> Optional[ExecutionView]:
+        try:
+            view = load_indexed_json(self.executions_dir / f"{execution_id}.json")
+        except FileNotFoundError:
+            view = None
+        return view if view is not None else super().load_execution_view(execution_id)
+    
+    def list_executions(self, limit: int = 100, cursor: Optional[str] = None, **filters: Any) -> List["Execution"]:
         """List recent executions from index."""
-        if not self.index_file.exists():
-            return []
-        
-        with open(self.index_file, "r") as f:
-            index = json.load(f)
-        
-        executions = index.get("executions", [])
-        executions.sort(key=lambda x: x.get("started_at", ""), reverse=True)
-        
         result = []
-        for exec_info in executions[:limit]:
+        entries = [entry for entry in filter_index_entries(self._index.entries(), cursor, **filters) if not entry.get("downsampled")]
+        for exec_info in entries[:limit]:
             execution = self.load_execution(exec_info["execution_id"])
             if execution:
                 result.append(execution)
         return result
     
-    def _update_index(self, execution_id: str, name: str, started_at: str) -> None:
-        if not self.index_file.exists():
-            index = {"executions": []}
-        else:
-            with open(self.index_file, "r") as f:
-                index = json.load(f)
-        
-        index["executions"] = [e for e in index["executions"] if e["execution_id"] != execution_id]
-        index["executions"].insert(0, {
-            "execution_id": execution_id,
-            "name": name,
-            "started_at": started_at
-        })
+    def list_execution_summaries(self, limit: int = 100, cursor: Optional[str] = None, **filters: Any) -> List[Dict[str, Any]]:
+        """List recent execution summaries straight from the index, without loading step payloads."""
+        result = []
+        for exec_info in filter_index_entries(self._index.entries(), cursor, **filters)[:limit]:
+            if "step_count" not in exec_info:
+                execution = self.load_execution(exec_info["execution_id"])
+                if execution is not None:
+                    exec_info = execution.summary()
+                elif not exec_info.get("downsampled"):
+                    continue
+            result.append(summary_from_entry(exec_info))
+        return result
+    
+    def iter_execution_ids(self, batch_size: int = 100) -> Iterator[str]:
+        for entry in filter_index_entries(self._index.entries()):
+            if not entry.get("downsampled"):
+                yield entry["execution_id"]
+    
+    def compact(self, policy: "RetentionPolicy", now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Downsampled executions lose their execution file but keep their index entry,
+        so they still appear in list_execution_summaries.
+        """
+        from .retention import plan_retention
         
-        with open(self.index_file, "w") as f:
-            json.dump(index, f, indent=2)
+        with self._index.lock():
+            entries = self._index.entries()
+            for entry in entries:
+                if not entry.get("downsampled"):
+                    entry["bytes"] = self._payload_size(entry["execution_id"])
+            delete, downsample = plan_retention(entries, policy, now)
+            if delete or downsample:
+                # Entries migrated from index.json carry no summary fields; take them from
+                # the execution file before it goes, so the summary outlives it.
+                summaries = {}
+                for entry in entries:
+                    if entry["execution_id"] in downsample and "step_count" not in entry:
+                        execution = self.load_execution(entry["execution_id"])
+                        if execution is not None:
+                            summaries[entry["execution_id"]] = execution.summary()
+                
+                def rewrite(entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+                    if entry["execution_id"] in delete:
+                        return None
+                    if entry["execution_id"] in downsample:
+                        entry.update(summaries.get(entry["execution_id"], {}))
+                        entry["downsampled"] = True
+                    return entry
+                
+                self._index.compact_locked(rewrite)
+                for execution_id in delete | downsample:
+                    for extension in self._serializer.extensions:
+                        (self.executions_dir / f"{execution_id}{extension}").unlink(missing_ok=True)
+        return {"deleted": len(delete), "downsampled": len(downsample)}
+    
+    def compact_index(self) -> None:
+        self._index.compact()
+    
+    def _payload_size(self, execution_id: str) -> int:
+        for extension in self._serializer.extensions:
+            try:
+                return (self.executions_dir / f"{execution_id}{extension}").stat().st_size
+            except FileNotFoundError:
+                continue
+        return 0
     
     def _dict_to_execution(self, data: dict) -> "Execution":
-        from .core import Execution, Step
-        
-        steps = [
-            Step(
-                name=step["name"],
-                inputs=step["inputs"],
-                outputs=step["outputs"],
-                reasoning=step.get("reasoning"),
-                metadata=step.get("metadata", {}),
-                timestamp=step.get("timestamp"),
-                duration_ms=step.get("duration_ms")
-            )
-            for step in data.get("steps", [])
-        ]
-        
-        return Execution(
-            execution_id=data["execution_id"],
-            name=data["name"],
-            steps=steps,
-            started_at=data["started_at"],
-            ended_at=data.get("ended_at"),
-            metadata=data.get("metadata", {})
-        )
-
+        return execution_from_dict(data)
@@ -0,0 +1,284 @@
+import functools
+import re
+import threading
+import weakref
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, TYPE_CHECKING
+
+from .codecs import json_dumps, json_loads
+from .core import Step, _STEP_FIELDS, _step_dict, expand_entity_refs
+
+if TYPE_CHECKING:
+    from .core import Execution
+
+
+# Step fields small enough to keep in the step index; the rest are parsed on access.
+STEP_HEADER_FIELDS = ("name", "timestamp", "duration_ms", "step_id", "parent_step_id", "ended_at")
+
+_TRAILER = re.compile(rb',"step_index_at":"(\d{10})"\}\s*$')
+_RANGE = re.compile(r"^(\d*):(\d*)$")
+_MISSING = object()
+
+
+class StepView:
+    """A step whose inputs, outputs, reasoning and metadata are only parsed on first access."""
+
+    def __init__(self, header: Dict[str, Any], load: Callable[[], Dict[str, Any]]):
+        self.name: str = header["name"]
+        self.timestamp: Optional[str] = header.get("timestamp")
+        self.duration_ms: Optional[float] = header.get("duration_ms")
+        self.step_id: Optional[str] = header.get("step_id")
+        self.parent_step_id: Optional[str] = header.get("parent_step_id")
+        self.ended_at: Optional[str] = header.get("ended_at")
+        # Whether the payload holds entity references; unknown counts as yes.
+        self.has_refs: bool = header.get("has_refs", True)
+        self._load = load
+
+    @classmethod
+    def from_step(cls, step: Step) -> "StepView":
+        data = _step_dict(step)
+        return cls(data, lambda: data)
+
+    @functools.cached_property
+    def _payload(self) -> Dict[str, Any]:
+        return self._load()
+
+    @property
+    def inputs(self) -> Dict[str, Any]:
+        return self._payload["inputs"]
+
+    @property
+    def outputs(self) -> Dict[str, Any]:
+        return self._payload["outputs"]
+
+    @property
+    def reasoning(self) -> Optional[str]:
+        return self._payload.get("reasoning")
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return self._payload.get("metadata", {})
+
+    def header(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in STEP_HEADER_FIELDS}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in _STEP_FIELDS}
+
+    def to_step(self) -> Step:
+        return Step(**self.to_dict())
+
+
+class ExecutionView:
+    """
+    Read-only execution whose steps are StepViews. Storage backends that can
+    locate single steps (JSONFileStorage) parse only the steps that are read;
+    to_dict() can restrict output to some steps and some fields of them.
+    """
+
+    def __init__(
+        self,
+        data: Dict[str, Any],
+        steps: List[StepView],
+        load_entities: Optional[Callable[[], Dict[str, Dict[str, Any]]]] = None,
+    ):
+        self.execution_id: str = data["execution_id"]
+        self.name: str = data["name"]
+        self.started_at: str = data["started_at"]
+        self.ended_at: Optional[str] = data.get("ended_at")
+        self.metadata: Dict[str, Any] = data.get("metadata", {})
+        self.steps = steps
+        self._load_entities = load_entities or (lambda: data.get("entities", {}))
+
+    @functools.cached_property
+    def entities(self) -> Dict[str, Dict[str, Any]]:
+        return self._load_entities()
+
+    @classmethod
+    def from_execution(cls, execution: "Execution") -> "ExecutionView":
+        data = {
+            "execution_id": execution.execution_id,
+            "name": execution.name,
+            "started_at": execution.started_at,
+            "ended_at": execution.ended_at,
+            "metadata": execution.metadata,
+            "entities": execution.entities,
+        }
+        return cls(data, [StepView.from_step(step) for step in execution.steps])
+
+    def select_steps(self, selectors: Optional[Iterable[str]] = None) -> List[StepView]:
+        """
+        Steps matching any selector, in execution order: a step index ("3"), a
+        Python-style index range ("2:5", ":10") or a step name. None selects all.
+        """
+        if selectors is None:
+            return list(self.steps)
+        selected = set()
+        for selector in selectors:
+            selector = selector.strip()
+            match = _RANGE.match(selector)
+            if selector.isdigit():
+                selected.add(int(selector))
+            elif match:
+                start, end = (int(bound) if bound else None for bound in match.groups())
+                selected.update(range(len(self.steps))[start:end])
+            else:
+                selected.update(i for i, step in enumerate(self.steps) if step.name == selector)
+        return [step for i, step in enumerate(self.steps) if i in selected]
+
+    def to_dict(
+        self,
+        expand_refs: bool = True,
+        steps: Optional[Iterable[str]] = None,
+        fields: Optional[Iterable[str]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Same shape as Execution.to_dict(). `steps` takes select_steps() selectors;
+        `fields` takes dotted paths into each step ("metadata.failed_by_filter"),
+        which keep only those values besides the step's header fields. Paths
+        continue through lists element by element.
+        """
+        paths = [field.split(".") for field in fields] if fields is not None else None
+        step_dicts = []
+        for step in self.select_steps(steps):
+            if paths is not None and all(path[0] in STEP_HEADER_FIELDS for path in paths):
+                step_dicts.append(step.header())
+                continue
+            data = step.to_dict()
+            if expand_refs and step.has_refs and self.entities:
+                data = expand_entity_refs(data, self.entities)
+            if paths is not None:
+                data = project(data, paths, keep=STEP_HEADER_FIELDS)
+            step_dicts.append(data)
+
+        data = {
+            "execution_id": self.execution_id,
+            "name": self.name,
+            "steps": step_dicts,
+            "started_at": self.started_at,
+            "ended_at": self.ended_at,
+            "metadata": self.metadata,
+        }
+        if not expand_refs:
+            data["entities"] = self.entities
+        return data
+
+    def to_execution(self) -> "Execution":
+        from .core import Execution
+
+        return Execution(
+            execution_id=self.execution_id,
+            name=self.name,
+            steps=[step.to_step() for step in self.steps],
+            started_at=self.started_at,
+            ended_at=self.ended_at,
+            metadata=self.metadata,
+            entities=self.entities,
+        )
+
+
+def project(value: Dict[str, Any], paths: List[List[str]], keep: Iterable[str] = ()) -> Dict[str, Any]:
+    """The parts of `value` at `paths` (key lists), plus its top-level `keep` keys."""
+    result = {key: value[key] for key in keep if key in value}
+    for path in paths:
+        picked = _pick(value, path)
+        if picked is not _MISSING:
+            result = _merge(result, picked)
+    return result
+
+
+def _pick(value: Any, path: List[str]) -> Any:
+    if not path:
+        return value
+    if isinstance(value, list):
+        # Elements without the path stay as {} so list positions line up across paths.
+        return [{} if item is _MISSING else item for item in (_pick(item, path) for item in value)]
+    if isinstance(value, dict) and path[0] in value:
+        picked = _pick(value[path[0]], path[1:])
+        return {path[0]: picked} if picked is not _MISSING else _MISSING
+    return _MISSING
+
+
+def _merge(target: Any, source: Any) -> Any:
+    if isinstance(target, dict) and isinstance(source, dict):
+        merged = dict(target)
+        for key, value in source.items():
+            merged[key] = _merge(merged[key], value) if key in merged else value
+        return merged
+    if isinstance(target, list) and isinstance(source, list) and len(target) == len(source):
+        return [_merge(a, b) for a, b in zip(target, source)]
+    return source
+
+
+def encode_indexed_json(data: Dict[str, Any]) -> bytes:
+    """
+    Compact JSON for an execution dict, laid out so single steps can be read
+    without parsing the rest: execution fields first, then the steps and the
+    entity table, then a step index with the byte ranges of the fields, the
+    entities and each step (plus its header fields), and last a fixed-width
+    "step_index_at" offset locating the index. Still plain JSON.
+    """
+    head = json_dumps({key: value for key, value in data.items() if key not in ("steps", "entities")}).encode()
+    out = bytearray(head[:-1])
+    fields_end = len(out)
+    out += b',"steps":['
+    headers = []
+    for i, step in enumerate(data.get("steps", [])):
+        if i:
+            out += b","
+        start = len(out)
+        encoded = json_dumps(step).encode()
+        out += encoded
+        header = {name: step.get(name) for name in STEP_HEADER_FIELDS}
+        header["range"] = [start, len(out)]
+        header["has_refs"] = b'"$ref"' in encoded
+        headers.append(header)
+    out += b'],"entities":'
+    entities_start = len(out)
+    out += json_dumps(data.get("entities", {})).encode()
+    entities_range = [entities_start, len(out)]
+    out += b',"step_index":'
+    index_at = len(out)
+    out += json_dumps({"fields": [1, fields_end], "entities": entities_range, "steps": headers}).encode()
+    out += b',"step_index_at":"%010d"}' % index_at
+    return bytes(out)
+
+
+def load_indexed_json(path: Path) -> Optional[ExecutionView]:
+    """
+    View over a file written by encode_indexed_json, or None if it has no step
+    index. The view keeps the file open until it is garbage collected, so steps
+    read later still come from this version even if the file has since been
+    replaced or deleted (e.g. by retention).
+    """
+    f = open(path, "rb")
+    try:
+        size = f.seek(0, 2)
+        tail_at = max(0, size - 64)
+        f.seek(tail_at)
+        match = _TRAILER.search(f.read())
+        if match is None:
+            f.close()
+            return None
+        index_at = int(match.group(1))
+        f.seek(index_at)
+        index = json_loads(f.read(tail_at + match.start() - index_at))
+        fields_start, fields_end = index["fields"]
+        f.seek(fields_start)
+        data = json_loads(b"{" + f.read(fields_end - fields_start) + b"}")
+    except BaseException:
+        f.close()
+        raise
+    lock = threading.Lock()
+
+    def reader(start: int, end: int) -> Callable[[], Any]:
+        def load() -> Any:
+            with lock:
+                f.seek(start)
+                return json_loads(f.read(end - start))
+        return load
+
+    steps = [StepView(header, reader(*header["range"])) for header in index["steps"]]
+    view = ExecutionView(data, steps, reader(*index["entities"]))
+    weakref.finalize(view, f.close)
+    return view